@@ -20,6 +20,62 @@ from scripts.utils.logger import setup_logger
 ####################################################################################################
 #                                          Functions                                               #
 ####################################################################################################
+def count_items(batches, counter: dict):
+    """
+    Passes batches through unchanged and counts the items in counter["items"].
+    """
+    for batch in batches:
+        counter["items"] += len(batch)
+        yield batch
+
+
+def run_streaming_process(process_name: str, process_config: dict) -> bool:
+    """
+    Runs a process batch by batch: the batches of the extractor flow through the transformer
+    directly into the loader, so only a few batches are held in memory at a time.
+    """
+    from scripts.classes.ETLExtract import ETLExtractFactory
+    from scripts.classes.ETLTransform import ETLTransformFactory
+    from scripts.classes.ETLLoad import ETLLoadFactory
+
+    extractor = ETLExtractFactory.create_extractor(process_config.get("extraction", {}))
+    log.info(f"Created extractor: {extractor}")
+    if not extractor.setup():
+        if extractor.skipped:
+            log.info(f"Nothing to extract, skipping process: {process_name}")
+            return True
+        log.error(f"Extractor setup failed for process: {process_name}")
+        return False
+
+    transformer = None
+    transform_config: dict | list = process_config.get("transformation", {})
+    if transform_config:
+        transformer = ETLTransformFactory.create_transformer(transform_config)
+        log.info(f"Created transformer: {transformer}")
+        if not transformer.setup():
+            log.error(f"Transformer setup failed for process: {process_name}")
+            return False
+
+    loader = ETLLoadFactory.create_loader(process_config.get("loading", {}))
+    log.info(f"Created loader: {loader}")
+    if not loader.setup():
+        log.error(f"Loader setup failed for process: {process_name}")
+        return False
+
+    counter: dict = {"extracted": {"items": 0}, "loaded": {"items": 0}}
+    batches = count_items(extractor.extract_batches(), counter["extracted"])
+    if transformer is not None:
+        batches = transformer.transform_batches(batches)
+    batches = count_items(batches, counter["loaded"])
+
+    start_time = time.time()
+    load_result = loader.load_batches(batches)
+    duration = time.time() - start_time
+    log.info(f"Streamed process {process_name}: {counter['extracted']['items']} items extracted, {counter['loaded']['items']} items loaded")
+    log.info(f"Streaming duration for process {process_name}: {duration:.2f} seconds")
+    if load_result:
+        extractor.mark_loaded()
+    return load_result
 
 
 ####################################################################################################
@@ -55,6 +111,14 @@ if __name__ == "__main__":
             continue
         log.info(f"Starting process: {process_name}")
 
+        # Streaming processes run extract, transform and load batch by batch
+        if process_config.get("streaming", False):
+            try:
+                run_streaming_process(process_name, process_config)
+            except Exception as e:
+                log.error(f"Exception during streaming process {process_name}: {e}")
+            continue
+
         # ETL Extract
         extract_config: dict = process_config.get("extraction", {})
         data: dict = None
@@ -72,6 +136,9 @@ if __name__ == "__main__":
                 extract_duration = extract_end_time - extract_start_time
                 log.info(f"Extracted data for process {process_name}: {len(data.get('items', []))} items")
                 log.info(f"Extraction duration for process {process_name}: {extract_duration:.2f} seconds")
+            elif extractor.skipped:
+                log.info(f"Nothing to extract, skipping process: {process_name}")
+                continue
             else:
                 log.error(f"Extractor setup failed for process: {process_name}")
                 continue
@@ -80,7 +147,7 @@ if __name__ == "__main__":
             continue
 
         # ETL Transform
-        transform_config: dict = process_config.get("transformation", {})
+        transform_config: dict | list = process_config.get("transformation", {})
         # Only perform transformation if config is provided
         if not transform_config:
             log.info(f"No transformation configuration provided for process: {process_name}. Skipping transformation.")
@@ -124,9 +191,15 @@ if __name__ == "__main__":
                     load_duration = load_end_time - load_start_time
                     log.info(f"Loaded data for process {process_name}:")
                     log.info(f"Load duration for process {process_name}: {load_duration:.2f} seconds")
+                    if load_result:
+                        extractor.mark_loaded()
                 else:
                     log.error(f"No data to load for process: {process_name}")
             else:
                 log.error(f"Loader setup failed for process: {process_name}")
         except Exception as e:
             log.error(f"Exception occurred while loading data for process {process_name}: {e}")
+
+    # Close pooled database connections
+    from scripts.utils.connection_pool import close_all_pools
+    close_all_pools()
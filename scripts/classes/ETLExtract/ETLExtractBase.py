@@ -19,6 +19,9 @@ log = logging.getLogger(__name__)
 class ETLExtractBase:
     def __init__(self, config):
         self.config = config
+        # Set by setup() if there is nothing to extract (e.g. the file was already ingested),
+        # the process is then skipped without an error
+        self.skipped = False
 
     def __str__(self):
         return f"ETLExtractBase with config: {self.config}"
@@ -28,6 +31,21 @@ class ETLExtractBase:
 
     def extract(self) -> dict:
         raise NotImplementedError("Extract method must be implemented by subclasses.")
+
+    def extract_batches(self):
+        """
+        Yields the extracted items in batches (lists of item dictionaries).
+        The default implementation yields the complete result of extract() as one batch,
+        subclasses which can read their source incrementally should override it.
+        """
+        yield self.extract().get("items", [])
+
+    def mark_loaded(self):
+        """
+        Called after the extracted data was loaded successfully.
+        Subclasses can override this to persist state (e.g. manifests) for the next run.
+        """
+        pass
     
     def save_debug_data(self, data: dict):
         """
@@ -37,7 +55,7 @@ class ETLExtractBase:
         now = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         debug_file: str = f"debug/{self.name}_{now}_debug_data.json"
         with open(debug_file, "w") as f:
-            json.dump(data, f, indent=4)
+            json.dump(data, f, indent=4, default=str)
         log.debug(f"Saved debug data to {debug_file}")
     
     def save_debug_data_mapped(self, data: dict):
@@ -48,5 +66,5 @@ class ETLExtractBase:
         now = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         debug_file: str = f"debug/{self.name}_{now}_debug_mapped_data.json"
         with open(debug_file, "w") as f:
-            json.dump(data, f, indent=4)
+            json.dump(data, f, indent=4, default=str)
         log.debug(f"Saved debug data to {debug_file}")
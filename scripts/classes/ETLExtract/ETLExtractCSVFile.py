@@ -2,10 +2,13 @@
 # Class to extract data from a csv file.                                                                               #
 ########################################################################################################################
 import logging
+import os
 
 import requests
 
 from scripts.classes.ETLExtract.ETLExtractBase import ETLExtractBase
+from scripts.utils.converters import convert_column, infer_type
+from scripts.utils.manifest import FileManifest
 
 
 ########################################################################################################################
@@ -24,6 +27,18 @@ class ETLExtractCSVFile(ETLExtractBase):
         self.columns = config.get("columns", [])
         self.mapping = config.get("mapping", {})
         self.debug = config.get("debug", False)
+        self.manifest_file = config.get("manifest_file", "")
+        self.manifest = FileManifest(self.manifest_file) if self.manifest_file else None
+        self.manifest_entry = None
+        self.schema = config.get("schema", {})
+        self.infer_types = config.get("infer_types", False)
+        self.infer_sample_size = config.get("infer_sample_size", 100)
+        self.type_options = {
+            "decimal_separator": config.get("decimal_separator", "."),
+            "date_format": config.get("date_format", ""),
+            "datetime_format": config.get("datetime_format", "")
+        }
+        self.conversion_errors = []
 
     def __str__(self):
         return f"ETLExtractCSVFile({self.file_path})"
@@ -34,7 +49,6 @@ class ETLExtractCSVFile(ETLExtractBase):
         # Else search for any csv file in the directory and use the first one found
         if self.file_path and not self.file_path.lower().endswith(".csv"):
             log.info(f"Searching for specified file: {self.file_path}")
-            import os
             if not os.path.isfile(self.file_path):
                 log.warning(f"Specified file not found: {self.file_path}")
                 
@@ -42,12 +56,20 @@ class ETLExtractCSVFile(ETLExtractBase):
                 log.info(f"Searching for any CSV file in directory: {self.file_path}")
                 directory = os.path.dirname(self.file_path)
                 file_found = False
-                for file in os.listdir(directory):
+                ingested_found = False
+                for file in sorted(os.listdir(directory)):
                     if file.lower().endswith(".csv"):
+                        if self.is_already_ingested(os.path.join(directory, file)):
+                            ingested_found = True
+                            continue
                         self.file_path = os.path.join(directory, file)
                         log.info(f"Found CSV file: {self.file_path}")
                         file_found = True
                         break
+                if not file_found and ingested_found:
+                    log.info(f"Nothing to do, all CSV files in directory were already ingested: {directory}")
+                    self.skipped = True
+                    return False
                 if not file_found:
                     log.error(f"No CSV file found in directory: {directory}")
                     self.file_path = ""
@@ -55,8 +77,61 @@ class ETLExtractCSVFile(ETLExtractBase):
         if not self.file_path:
             log.error("No file path provided for CSV extraction.")
             return False
+        if self.manifest_entry is None and os.path.isfile(self.file_path) and self.is_already_ingested(self.file_path):
+            log.info(f"Nothing to do, file was already ingested: {self.file_path}")
+            self.skipped = True
+            return False
         return True
 
+    def is_already_ingested(self, file_path: str) -> bool:
+        """
+        Checks the manifest for the given file and remembers its entry for mark_loaded.
+        Always False if no manifest_file is configured.
+        """
+        if self.manifest is None:
+            return False
+        ingested, entry = self.manifest.lookup(file_path)
+        if ingested:
+            log.info(f"Skipping already ingested file: {file_path}")
+            return True
+        self.manifest_entry = entry
+        return False
+
+    def convert_types(self, header: list, data: list):
+        """
+        Converts the raw string values column by column into typed values.
+        Types are taken from the configured schema, columns not in the schema are inferred
+        from a sample of their values if infer_types is enabled.
+        Conversion errors are collected in self.conversion_errors, failed values become None.
+        """
+        self.conversion_errors = []
+        for column in header:
+            type_name = self.schema.get(column)
+            values = [record[column] for record in data]
+            if type_name is None and self.infer_types:
+                type_name = infer_type(values[:self.infer_sample_size], self.type_options)
+                log.debug(f"Inferred type '{type_name}' for column '{column}'")
+            if type_name is None or type_name == "string":
+                continue
+
+            converted, errors = convert_column(values, type_name, self.type_options)
+            for record, value in zip(data, converted):
+                record[column] = value
+            for index, value, error in errors:
+                self.conversion_errors.append({"row": index + 1, "column": column, "value": value, "error": error})
+
+        if self.conversion_errors:
+            log.warning(f"{len(self.conversion_errors)} values could not be converted, first error: {self.conversion_errors[0]}")
+            if self.debug:
+                self.save_debug_data({"conversion_errors": self.conversion_errors})
+
+    def mark_loaded(self):
+        """
+        Records the extracted file in the manifest once it was loaded successfully.
+        """
+        if self.manifest is not None and self.manifest_entry is not None:
+            self.manifest.record(self.manifest_entry)
+
     def extract(self) -> dict:
         # Extract data from CSV file
         try:
@@ -72,6 +147,9 @@ class ETLExtractCSVFile(ETLExtractBase):
             if self.debug:
                 self.save_debug_data({"raw_data": data})
 
+            if self.schema or self.infer_types:
+                self.convert_types(header, data)
+
             if self.save_path:
                 # Move file to save path
                 import shutil
@@ -87,6 +165,8 @@ class ETLExtractCSVFile(ETLExtractBase):
             return result
         except Exception as e:
             log.error(f"Error extracting data from CSV file: {e}")
+            # A file which could not be extracted must not be recorded as ingested by mark_loaded
+            self.manifest_entry = None
             return {}
     
 
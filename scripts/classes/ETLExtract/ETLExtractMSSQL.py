@@ -2,12 +2,19 @@
 # Class for ETL Extraction from a MSSQL Database table                                                                 #
 ########################################################################################################################
 import datetime
+import decimal
 import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import pyodbc
 
 from scripts.classes.ETLExtract.ETLExtractBase import ETLExtractBase
+from scripts.utils.connection_pool import get_pool
+from scripts.utils.watermark import load_watermark, save_watermark
 
 
 ########################################################################################################################
@@ -28,33 +35,64 @@ class ETLExtractMSSQL(ETLExtractBase):
         self.password = config.get('connection').get('password', '')
         self.driver = config.get('connection').get('driver', '{ODBC Driver 17 for SQL Server}')
         self.connection_string = f'DRIVER={self.driver};SERVER={self.server};DATABASE={self.database};UID={self.username};PWD={self.password}'
+        self.max_connections = config.get('connection').get('max_connections')
+        self.pool = get_pool(self.connection_string, self.server, self.max_connections)
         self.mapping = config.get('mappings', {})
+        self.stream = config.get('stream', False)
+        self.arraysize = config.get('arraysize', 5000)
+        self.partition_column = config.get('partition', {}).get('column', '')
+        self.partition_count = config.get('partition', {}).get('count', 4)
+        self.partition_bounds = config.get('partition', {}).get('bounds', [])
+        self.partition_method = config.get('partition', {}).get('method', 'minmax')
+        self.partition_connections = config.get('partition', {}).get('connections', self.partition_count)
+        self.watermark_column = config.get('incremental', {}).get('column', '')
+        self.watermark_state_file = config.get('incremental', {}).get('state_file', f"state/watermarks/{config.get('name', 'ETLExtractMSSQL')}.json")
+        self.watermark = None
+        self.new_watermark = None
         self.conn = None
+        self.columns = []
+        self.stats = {}
 
     def __str__(self):
         return f"ETLExtractMSSQL({self.server}, {self.database})"
 
     def connect(self):
         """
-        Establish a connection to the MSSQL database.
+        Check out a connection to the MSSQL database from the shared connection pool.
 
         :return: pyodbc Connection object
         """
         try:
-            connection = pyodbc.connect(self.connection_string)
+            connection = self.pool.acquire()
             log.info("Successfully connected to MSSQL database.")
             return connection
         except pyodbc.Error as e:
             log.error(f"Error connecting to MSSQL database: {e}")
             raise
 
+    def close(self):
+        """
+        Return the setup connection to the shared connection pool.
+        """
+        if self.conn is not None:
+            self.pool.release(self.conn)
+            self.conn = None
     
     def setup(self) -> bool:
         """
         Setup the MSSQL database connection and verify connectivity.
         Check if the source table exists.
+        In incremental mode the last watermark is loaded.
         """
         try:
+            if self.watermark_column:
+                if "." in self.watermark_column:
+                    log.error(f"Watermark column '{self.watermark_column}' must be the name of a column of the query result, without table alias.")
+                    return False
+                self.watermark = load_watermark(self.watermark_state_file, self.config.get('incremental', {}).get('initial_value'))
+                if self.watermark is None and "?" in self.config.get('query', ''):
+                    log.error("Incremental query contains a '?' placeholder but neither a watermark nor an initial_value is available.")
+                    return False
             self.conn = self.connect()
             cursor = self.conn.cursor()
             table_name = self.config.get('table', 'source_table')
@@ -66,23 +104,298 @@ class ETLExtractMSSQL(ETLExtractBase):
             return True
         except Exception as e:
             log.error(f"Setup failed: {e}")
+            self.close()
             return False
 
+    def get_query(self) -> str:
+        """
+        Returns the configured query or a SELECT * on the configured table.
+        In incremental mode a query without '?' placeholder is restricted to rows above the watermark.
+        """
+        query = self.config.get('query', f"SELECT * FROM {self.config.get('table', 'source_table')}")
+        if self.watermark_column and self.watermark is not None and "?" not in query:
+            query = f"SELECT * FROM ({query}) AS incremental_source WHERE {self.watermark_column} > ?"
+        return query
+
+    def get_query_params(self) -> list:
+        """
+        Returns the parameters for the '?' placeholders of get_query (the watermark for every placeholder).
+        """
+        if not self.watermark_column or self.watermark is None:
+            return []
+        return [self.watermark] * self.get_query().count("?")
+
+    def check_watermark_column(self, columns: list):
+        """
+        Fail if the watermark column is not a column of the query result, the watermark would never advance.
+        """
+        if self.watermark_column and self.watermark_column.strip("[]") not in columns:
+            raise ValueError(f"Watermark column '{self.watermark_column}' is not a column of the query result: {columns}")
+
+    def get_max_watermark(self, items: list, watermark=None):
+        """
+        Returns the highest value of the watermark column in the extracted items and the given watermark.
+        """
+        if not self.watermark_column:
+            return watermark
+        key = self.watermark_column.strip("[]")
+        values = [item.get(key) for item in items if item.get(key) is not None]
+        if values:
+            batch_max = max(values)
+            if watermark is None or batch_max > watermark:
+                return batch_max
+        return watermark
+
+    def mark_loaded(self):
+        """
+        Advance the watermark once the extracted data was loaded successfully.
+        """
+        if self.watermark_column and self.new_watermark is not None and self.new_watermark != self.watermark:
+            save_watermark(self.watermark_state_file, self.watermark_column, self.new_watermark)
+            self.watermark = self.new_watermark
+
     def extract(self) -> dict:
         """
         Extract data from the MSSQL database table based on the provided SQL query.
         Maps the extracted data rows according to the defined mappings into a {"items": [...]} structure.
+        In stream or partition mode the rows are fetched in batches via extract_batches instead of fetchall.
         :return: Extracted data as a dictionary.
         """
+        self.new_watermark = None
         try:
+            if self.stream or self.partition_column:
+                items = []
+                for batch in self.extract_batches():
+                    items.extend(batch)
+                return {"items": items}
             cursor = self.conn.cursor()
-            query = self.config.get('query', f"SELECT * FROM {self.config.get('table', 'source_table')}")
-            cursor.execute(query)
+            query = self.get_query()
+            cursor.execute(query, *self.get_query_params())
             columns = [column[0] for column in cursor.description]
+            self.check_watermark_column(columns)
             rows = cursor.fetchall()
             data = {"items": [dict(zip(columns, row)) for row in rows]}
+            self.new_watermark = self.get_max_watermark(data["items"])
             log.info(f"Extracted {len(data['items'])} records from MSSQL database.")
             return data
         except Exception as e:
             log.error(f"Data extraction failed: {e}")
+            # A failed extraction must never advance the watermark in mark_loaded
+            self.new_watermark = None
             return {"items": []}
+        finally:
+            self.close()
+
+    def extract_batches(self):
+        """
+        Stream the query result in batches, from a single cursor or from parallel partitions.
+        All batches share the column schema in self.columns, so only a few batches are held on the client.
+        Throughput (rows/s) and fetch latency are logged at the end and kept in self.stats.
+        The new watermark is only set once all batches were fetched, so mark_loaded never saves the watermark
+        of an aborted extraction.
+        :return: Generator of lists of row dictionaries.
+        """
+        self.new_watermark = None
+        watermark = None
+        try:
+            batches = self.extract_partitioned_batches() if self.partition_column else self.fetch_batches()
+            for batch in batches:
+                watermark = self.get_max_watermark(batch, watermark)
+                yield batch
+            self.new_watermark = watermark
+        finally:
+            self.close()
+
+    def fetch_batches(self):
+        """
+        Fetch the query result on the setup connection in batches of `arraysize` rows.
+        :return: Generator of lists of row dictionaries.
+        """
+        cursor = self.conn.cursor()
+        cursor.arraysize = self.arraysize
+        start_time = time.perf_counter()
+        cursor.execute(self.get_query(), *self.get_query_params())
+        self.columns = [column[0] for column in cursor.description]
+        self.check_watermark_column(self.columns)
+        columns = self.columns
+
+        self.stats = {"rows": 0, "batches": 0, "fetch_seconds": 0.0, "max_fetch_latency": 0.0}
+        while True:
+            fetch_start_time = time.perf_counter()
+            rows = cursor.fetchmany(self.arraysize)
+            fetch_latency = time.perf_counter() - fetch_start_time
+            if not rows:
+                break
+            self.stats["rows"] += len(rows)
+            self.stats["batches"] += 1
+            self.stats["fetch_seconds"] += fetch_latency
+            self.stats["max_fetch_latency"] = max(self.stats["max_fetch_latency"], fetch_latency)
+            log.debug(f"Fetched batch {self.stats['batches']} with {len(rows)} rows in {fetch_latency * 1000:.1f} ms")
+            yield [dict(zip(columns, row)) for row in rows]
+        cursor.close()
+
+        duration = time.perf_counter() - start_time
+        self.stats["duration"] = duration
+        self.stats["rows_per_second"] = self.stats["rows"] / duration if duration > 0 else 0.0
+        self.stats["avg_fetch_latency"] = self.stats["fetch_seconds"] / self.stats["batches"] if self.stats["batches"] else 0.0
+        log.info(f"Streamed {self.stats['rows']} records in {self.stats['batches']} batches from MSSQL database "
+                 f"({self.stats['rows_per_second']:.0f} rows/s, avg fetch latency {self.stats['avg_fetch_latency'] * 1000:.1f} ms, "
+                 f"max {self.stats['max_fetch_latency'] * 1000:.1f} ms).")
+
+    def get_partition_ranges(self) -> list:
+        """
+        Compute the (lower, upper) key ranges of the partitions. Lower bounds are inclusive, upper bounds exclusive,
+        None means open. Uses the explicit `bounds` if configured, otherwise MIN/MAX of the partition column
+        (numeric and date columns) or NTILE buckets (any orderable column).
+        :return: List of (lower, upper) tuples.
+        """
+        splits = sorted(self.partition_bounds)
+        if not splits and self.partition_count > 1:
+            if self.partition_method == 'minmax':
+                splits = self.get_minmax_splits()
+            if not splits:
+                splits = self.get_ntile_splits()
+        return list(zip([None] + splits, splits + [None]))
+
+    def get_minmax_splits(self) -> list:
+        """
+        Split the range between MIN and MAX of the partition column into equally wide partitions.
+        :return: Sorted list of split points, empty if the column type can not be split arithmetically.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT MIN({self.partition_column}), MAX({self.partition_column}) FROM ({self.get_query()}) AS partition_source", *self.get_query_params())
+        low, high = cursor.fetchone()
+        cursor.close()
+        if low is None or high is None or isinstance(low, bool):
+            return []
+        count = self.partition_count
+        if isinstance(low, int):
+            splits = [low + (high - low + 1) * i // count for i in range(1, count)]
+        elif isinstance(low, (float, decimal.Decimal, datetime.date)):
+            splits = [low + (high - low) * i / count for i in range(1, count)]
+        else:
+            return []
+        return sorted(set(split for split in splits if low < split <= high))
+
+    def get_ntile_splits(self) -> list:
+        """
+        Split the partition column into NTILE buckets with (nearly) the same number of rows.
+        :return: Sorted list of split points (the lowest value of every bucket except the first).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"SELECT MIN(partition_value) FROM ("
+            f"SELECT {self.partition_column} AS partition_value, NTILE({self.partition_count}) OVER (ORDER BY {self.partition_column}) AS partition_bucket "
+            f"FROM ({self.get_query()}) AS partition_source WHERE {self.partition_column} IS NOT NULL"
+            f") AS partition_buckets GROUP BY partition_bucket ORDER BY partition_bucket",
+            *self.get_query_params()
+        )
+        lower_bounds = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        return sorted(set(lower_bounds[1:]))
+
+    def build_partition_query(self, lower, upper) -> tuple[str, list]:
+        """
+        Wrap the configured query into a query restricted to one key range.
+        NULL values of the partition column belong to the first partition.
+        :return: Tuple of (query, parameters)
+        """
+        conditions = []
+        params = self.get_query_params()
+        if lower is not None:
+            conditions.append(f"{self.partition_column} >= ?")
+            params.append(lower)
+        if upper is not None:
+            conditions.append(f"{self.partition_column} < ?")
+            params.append(upper)
+        where = " AND ".join(conditions) if conditions else "1 = 1"
+        if lower is None:
+            where = f"({where} OR {self.partition_column} IS NULL)"
+        return f"SELECT * FROM ({self.get_query()}) AS partition_source WHERE {where}", params
+
+    def extract_partitioned_batches(self):
+        """
+        Run the partition queries concurrently over `connections` connections and yield their batches
+        in the order they arrive. A bounded queue keeps the number of batches held in memory small.
+        :return: Generator of lists of row dictionaries.
+        """
+        ranges = self.get_partition_ranges()
+        # The setup connection is not needed anymore, hand it over to the partition workers
+        self.close()
+        connections = max(1, min(self.partition_connections, len(ranges)))
+        if connections > self.pool.max_connections:
+            log.warning(f"Limiting partition connections from {connections} to {self.pool.max_connections} (max_connections of {self.server}).")
+            connections = self.pool.max_connections
+        log.info(f"Extracting {len(ranges)} partitions on '{self.partition_column}' over {connections} connections.")
+
+        batch_queue = queue.Queue(maxsize=connections * 2)
+        cancelled = threading.Event()
+        start_time = time.perf_counter()
+        self.stats = {"rows": 0, "batches": 0, "partitions": len(ranges)}
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for index, (lower, upper) in enumerate(ranges, start=1):
+                executor.submit(self.extract_partition, index, lower, upper, batch_queue, cancelled)
+            pending = len(ranges)
+            try:
+                while pending:
+                    kind, payload = batch_queue.get()
+                    if kind == "batch":
+                        self.stats["rows"] += len(payload)
+                        self.stats["batches"] += 1
+                        yield payload
+                    elif kind == "error":
+                        raise payload
+                    else:
+                        pending -= 1
+            finally:
+                cancelled.set()
+
+        duration = time.perf_counter() - start_time
+        self.stats["duration"] = duration
+        self.stats["rows_per_second"] = self.stats["rows"] / duration if duration > 0 else 0.0
+        log.info(f"Extracted {self.stats['rows']} records from {len(ranges)} partitions ({self.stats['rows_per_second']:.0f} rows/s).")
+
+    def extract_partition(self, index: int, lower, upper, batch_queue: queue.Queue, cancelled: threading.Event):
+        """
+        Worker: read one partition on its own connection and put its batches onto the queue.
+        Always finishes with a ("done", index) or ("error", exception) message.
+        """
+        try:
+            if cancelled.is_set():
+                return
+            connection = self.connect()
+            try:
+                cursor = connection.cursor()
+                cursor.arraysize = self.arraysize
+                query, params = self.build_partition_query(lower, upper)
+                cursor.execute(query, *params)
+                columns = [column[0] for column in cursor.description]
+                self.check_watermark_column(columns)
+                rows_total = 0
+                while not cancelled.is_set():
+                    rows = cursor.fetchmany(self.arraysize)
+                    if not rows:
+                        break
+                    rows_total += len(rows)
+                    self.put_message(batch_queue, ("batch", [dict(zip(columns, row)) for row in rows]), cancelled)
+                log.info(f"Partition {index} ({lower} - {upper}) extracted {rows_total} records.")
+            finally:
+                self.pool.release(connection)
+        except Exception as e:
+            log.error(f"Extraction of partition {index} failed: {e}")
+            self.put_message(batch_queue, ("error", e), cancelled)
+            return
+        finally:
+            self.put_message(batch_queue, ("done", index), cancelled)
+
+    @staticmethod
+    def put_message(batch_queue: queue.Queue, message: tuple, cancelled: threading.Event):
+        """
+        Put a message onto the queue, giving up once the consumer has cancelled the extraction.
+        """
+        while not cancelled.is_set():
+            try:
+                batch_queue.put(message, timeout=0.5)
+                return
+            except queue.Full:
+                continue
@@ -12,4 +12,14 @@ class ETLLoadBase:
         raise NotImplementedError("Setup method must be implemented by subclasses.")
 
     def load(self, data: dict) -> bool:
-        raise NotImplementedError("Load method must be implemented by subclasses.")
\ No newline at end of file
+        raise NotImplementedError("Load method must be implemented by subclasses.")
+
+    def load_batches(self, batches) -> bool:
+        """
+        Loads a stream of batches (lists of item dictionaries).
+        The default implementation collects all batches and calls load() once on the whole dataset.
+        """
+        items = []
+        for batch in batches:
+            items.extend(batch)
+        return self.load({"items": items})
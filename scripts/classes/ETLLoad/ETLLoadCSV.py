@@ -3,10 +3,21 @@
 ########################################################################################################################
 import logging
 import csv
+import datetime
+import gzip
+import io
+import json
+import lzma
 import os
+import queue
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
+from scripts.utils.manifest import compute_file_hash
 
 
 ########################################################################################################################
@@ -15,6 +26,48 @@ from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
 # Setup Logger
 log = logging.getLogger(__name__)
 
+# File suffix per supported compression
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "xz": ".xz"}
+
+# Characters which may not appear in partition file names
+UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^\w.-]")
+
+
+class CSVPartitionFile:
+    """
+    One output file of a partition, written to a temp file until it is published.
+    Counts the written rows and (with a byte limit) the written uncompressed bytes.
+    """
+
+    def __init__(self, loader, path: str, partition, part: int, fieldnames: list):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.partition = partition
+        self.part = part
+        self.rows = 0
+        self.size = 0
+        self.checksum = ""
+        self.stream = loader.open_output(self.temp_path, 'w')
+        # Only route the rows through write() when the size has to be tracked
+        self.writer = csv.writer(self if loader.max_bytes_per_file else self.stream, delimiter=loader.delimiter)
+        if loader.header:
+            self.writer.writerow(fieldnames)
+
+    def write(self, text: str) -> int:
+        self.size += len(text.encode('utf-8'))
+        return self.stream.write(text)
+
+    def close(self):
+        self.stream.close()
+        self.size = os.path.getsize(self.temp_path)
+        self.checksum = compute_file_hash(self.temp_path)
+
+    def discard(self):
+        if not self.stream.closed:
+            self.stream.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
 class ETLLoadCSV(ETLLoadBase):
     """
     Class to Load data into a CSV File.
@@ -34,7 +87,22 @@ class ETLLoadCSV(ETLLoadBase):
         self.header = config.get('header', True)
         self.mapping = config.get('mappings', {})
         self.overwrite = config.get('overwrite', True)
+        self.compression = config.get('compression', '')
+        self.compression_level = config.get('compression_level', 6)
+        self.buffer_size = config.get('buffer_size', 1024 * 1024)
+        self.partition_by = config.get('partition_by', '')
+        self.max_rows_per_file = config.get('max_rows_per_file', 0)
+        self.max_bytes_per_file = config.get('max_bytes_per_file', 0)
+        self.writers = max(1, config.get('writers', 4))
+        self.partitioned = bool(self.partition_by or self.max_rows_per_file or self.max_bytes_per_file)
+        self.fields = None
+        suffix = COMPRESSION_SUFFIXES.get(self.compression, '')
+        if suffix and not self.filename.endswith(suffix):
+            self.filename = f"{self.filename}{suffix}"
         self.full_path = os.path.join(self.path, self.filename)
+        self.file_stem, self.file_extension = os.path.splitext(self.filename[:len(self.filename) - len(suffix)])
+        self.file_extension += suffix
+        self.manifest_path = os.path.join(self.path, f"{self.file_stem}.manifest.json")
 
     def setup(self) -> bool:
         """
@@ -42,6 +110,10 @@ class ETLLoadCSV(ETLLoadBase):
         Create directory if it doesn't exist.
         """
         try:
+            if self.compression and self.compression not in COMPRESSION_SUFFIXES:
+                log.error(f"Unsupported compression '{self.compression}', use one of {list(COMPRESSION_SUFFIXES)}.")
+                return False
+
             # Create directory if it doesn't exist
             Path(self.path).mkdir(parents=True, exist_ok=True)
             log.info(f"Output directory '{self.path}' is ready.")
@@ -60,55 +132,314 @@ class ETLLoadCSV(ETLLoadBase):
             log.error(f"Setup failed: {e}")
             return False
 
-    def load(self, data: dict) -> bool:
+    def open_output(self, file_path: str, mode: str):
         """
-        Load data into the CSV file.
-        
-        :param data: Dictionary containing 'items' list with data to write
+        Open the output file as text stream with a large write buffer, compressed if configured.
+
+        :param file_path: Path of the file to open
+        :param mode: 'w' to create or 'a' to append
+        :return: Text stream for the csv writer
+        """
+        if self.compression == 'gzip':
+            raw = gzip.open(file_path, f"{mode}b", compresslevel=self.compression_level)
+        elif self.compression == 'xz':
+            raw = lzma.open(file_path, f"{mode}b", preset=self.compression_level)
+        else:
+            raw = open(file_path, f"{mode}b", buffering=0)
+        return io.TextIOWrapper(io.BufferedWriter(raw, self.buffer_size), encoding='utf-8', newline='')
+
+    def get_fields(self, item: dict) -> tuple[list, list]:
+        """
+        Determine the header columns and the item fields written into them,
+        from the mapping or from the keys of the first item.
+
+        :return: Tuple of (fieldnames, source fields)
+        """
+        if self.mapping:
+            # Use mapping to determine column order
+            return list(self.mapping.values()), list(self.mapping.keys())
+        # Use keys from first item
+        return list(item.keys()), list(item.keys())
+
+    def load_batches(self, batches) -> bool:
+        """
+        Stream batches of items into the CSV file.
+        Rows are written as tuples through a buffered (optionally gzip/xz compressed) stream into a temp file,
+        which is renamed to the target file once all batches are written. Readers never see a half-written file.
+        In append mode the existing file is copied into the temp file first.
+
+        :param batches: Iterable of lists of items
         :return: True if successful, False otherwise
         """
+        if self.partitioned:
+            return self.load_partitioned(batches)
+        temp_path = f"{self.full_path}.tmp"
         try:
-            items = data.get('items', [])
-            
-            if not items:
+            # Determine write mode
+            append = not self.overwrite and os.path.exists(self.full_path)
+            if append:
+                shutil.copyfile(self.full_path, temp_path)
+
+            total_rows = 0
+            fields = None
+            with self.open_output(temp_path, 'a' if append else 'w') as csvfile:
+                writer = csv.writer(csvfile, delimiter=self.delimiter)
+                for batch in batches:
+                    if not batch:
+                        continue
+                    if fields is None:
+                        fieldnames, fields = self.get_fields(batch[0])
+                        if self.header and not append:
+                            writer.writerow(fieldnames)
+                            log.debug(f"CSV header written: {fieldnames}")
+                    # Missing fields are written as empty values
+                    writer.writerows([tuple(map(item.get, fields)) for item in batch])
+                    total_rows += len(batch)
+
+            if not total_rows:
+                os.remove(temp_path)
                 log.warning("No items to write to CSV file.")
                 return True
-            
-            # Determine fieldnames from mapping or from first item
-            if self.mapping:
-                # Use mapping to determine column order
-                fieldnames = list(self.mapping.values())
-            else:
-                # Use keys from first item
-                fieldnames = list(items[0].keys())
-            
-            # Determine write mode
-            file_exists = os.path.exists(self.full_path)
-            mode = 'w' if (self.overwrite or not file_exists) else 'a'
-            write_header = self.header and (mode == 'w' or not file_exists)
-            
-            # Write data to CSV
-            with open(self.full_path, mode=mode, newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=self.delimiter, extrasaction='ignore')
-                
-                if write_header:
-                    writer.writeheader()
-                    log.debug(f"CSV header written: {fieldnames}")
-                
-                # Write each item
-                for item in items:
-                    # Apply mapping if defined
-                    if self.mapping:
-                        mapped_item = {}
-                        for source_field, target_field in self.mapping.items():
-                            mapped_item[target_field] = item.get(source_field, '')
-                        writer.writerow(mapped_item)
-                    else:
-                        writer.writerow(item)
-                
-                log.info(f"Successfully wrote {len(items)} records to '{self.full_path}'.")
-            
+
+            os.replace(temp_path, self.full_path)
+            log.info(f"Successfully wrote {total_rows} records to '{self.full_path}'.")
             return True
         except Exception as e:
             log.error(f"Load failed: {e}")
-            return False
\ No newline at end of file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    @staticmethod
+    def get_partition_name(value) -> str:
+        """
+        Build the file name part of a partition value. Values with the same name (e.g. None and "",
+        or "A/B" and "A_B") are written into the same partition.
+
+        :param value: Value of the partition column
+        :return: Name of the partition
+        """
+        value = "empty" if value is None or value == "" else str(value)
+        return UNSAFE_FILENAME_CHARACTERS.sub('_', value)
+
+    def get_partition_path(self, partition: str, part: int) -> str:
+        """
+        Build the path of a partition file: <name>[_<partition name>][_<part>].<extension>
+
+        :param partition: Name of the partition (None without partition_by)
+        :param part: Running number of the file within the partition
+        :return: Path of the file
+        """
+        name = self.file_stem
+        if partition is not None:
+            name = f"{name}_{partition}"
+        if self.max_rows_per_file or self.max_bytes_per_file:
+            name = f"{name}_{part:04d}"
+        return os.path.join(self.path, f"{name}{self.file_extension}")
+
+    def is_file_full(self, partition_file: CSVPartitionFile) -> bool:
+        """
+        Check whether a partition file reached max_rows_per_file or max_bytes_per_file.
+        """
+        if self.max_rows_per_file and partition_file.rows >= self.max_rows_per_file:
+            return True
+        return bool(self.max_bytes_per_file and partition_file.size >= self.max_bytes_per_file)
+
+    def write_partitions(self, work_queue: queue.Queue, failed: threading.Event) -> list:
+        """
+        Writer: consume (partition, items) messages from the queue and write them into the files of the partitions,
+        rolling over to a new file whenever the current one is full. Stops at the None marker.
+
+        :return: List of all written (closed) partition files
+        """
+        current: dict = {}
+        written: list = []
+        try:
+            while True:
+                message = work_queue.get()
+                if message is None:
+                    break
+                if failed.is_set():
+                    continue
+                partition, items = message
+                position = 0
+                while position < len(items):
+                    partition_file = current.get(partition)
+                    if partition_file is None or self.is_file_full(partition_file):
+                        if partition_file is not None:
+                            partition_file.close()
+                        part = partition_file.part + 1 if partition_file is not None else 1
+                        fieldnames = self.fields[0]
+                        partition_file = CSVPartitionFile(self, self.get_partition_path(partition, part), partition, part, fieldnames)
+                        current[partition] = partition_file
+                        written.append(partition_file)
+                    if self.max_bytes_per_file:
+                        # Size limit: the size is checked after every row
+                        end = position + 1
+                    elif self.max_rows_per_file:
+                        end = position + self.max_rows_per_file - partition_file.rows
+                    else:
+                        end = len(items)
+                    rows = [tuple(map(item.get, self.fields[1])) for item in items[position:end]]
+                    partition_file.writer.writerows(rows)
+                    partition_file.rows += len(rows)
+                    position += len(rows)
+            for partition_file in current.values():
+                partition_file.close()
+            return written
+        except Exception:
+            failed.set()
+            for partition_file in written:
+                partition_file.discard()
+            raise
+
+    def publish_partitions(self, partition_files: list) -> dict:
+        """
+        Rename the partition files to their final names, write the manifest and remove files
+        of the previous run which were not produced again.
+
+        :return: Manifest dictionary
+        """
+        previous_files: set = set()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                previous_files = {entry.get("file") for entry in json.load(f).get("files", [])}
+
+        # Check all files before publishing any of them, so a failure never leaves a partial output
+        paths: set = set()
+        for partition_file in partition_files:
+            if partition_file.path in paths:
+                raise RuntimeError(f"Partition file '{partition_file.path}' was written twice")
+            if not os.path.exists(partition_file.temp_path):
+                raise FileNotFoundError(f"Temp file '{partition_file.temp_path}' of a partition is missing")
+            paths.add(partition_file.path)
+
+        entries: list = []
+        for partition_file in sorted(partition_files, key=lambda f: f.path):
+            os.replace(partition_file.temp_path, partition_file.path)
+            entries.append({
+                "file": os.path.basename(partition_file.path),
+                "partition": partition_file.partition,
+                "part": partition_file.part,
+                "rows": partition_file.rows,
+                "bytes": partition_file.size,
+                "checksum": partition_file.checksum
+            })
+        manifest: dict = {
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "checksum_algorithm": "blake2b",
+            "partition_by": self.partition_by,
+            "total_rows": sum(entry["rows"] for entry in entries),
+            "files": entries
+        }
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+        for stale_file in previous_files - {entry["file"] for entry in entries}:
+            stale_path = os.path.join(self.path, stale_file)
+            if stale_file and os.path.exists(stale_path):
+                os.remove(stale_path)
+                log.info(f"Removed outdated partition file '{stale_path}'.")
+        return manifest
+
+    def load_partitioned(self, batches) -> bool:
+        """
+        Stream batches of items into several files: one per value of `partition_by` and/or
+        a new file every `max_rows_per_file` rows or `max_bytes_per_file` (uncompressed) bytes.
+        The partitions are distributed over `writers` parallel writer threads through bounded queues.
+        All files are published together once every writer finished, followed by a manifest
+        listing the files with row counts and checksums.
+
+        :param batches: Iterable of lists of items
+        :return: True if successful, False otherwise
+        """
+        if not self.overwrite:
+            log.warning("Partitioned output always replaces the files of the previous run, 'overwrite' is ignored.")
+        work_queues = [queue.Queue(maxsize=8) for _ in range(self.writers)]
+        failed = threading.Event()
+        assignment: dict = {}
+        partition_names: dict = {}
+        self.fields = None
+
+        def send(work_queue: queue.Queue, message):
+            while True:
+                try:
+                    work_queue.put(message, timeout=0.5)
+                    return
+                except queue.Full:
+                    if failed.is_set():
+                        # The failed writer does not consume anymore, make room for the stop marker
+                        while not work_queue.empty():
+                            work_queue.get_nowait()
+
+        results: list = []
+        error = None
+        with ThreadPoolExecutor(max_workers=self.writers) as executor:
+            futures = [executor.submit(self.write_partitions, work_queue, failed) for work_queue in work_queues]
+            try:
+                for batch in batches:
+                    if failed.is_set():
+                        break
+                    if not batch:
+                        continue
+                    if self.fields is None:
+                        self.fields = self.get_fields(batch[0])
+                    if self.partition_by:
+                        # Grouped by partition name, so values sharing a file name share one writer and file
+                        groups: dict = {}
+                        for item in batch:
+                            value = item.get(self.partition_by)
+                            name = partition_names.get(value)
+                            if name is None:
+                                name = partition_names[value] = self.get_partition_name(value)
+                            groups.setdefault(name, []).append(item)
+                    else:
+                        groups = {None: batch}
+                    for partition, items in groups.items():
+                        # Partitions are assigned round robin to the writers on first sight
+                        index = assignment.setdefault(partition, len(assignment) % self.writers)
+                        send(work_queues[index], (partition, items))
+            except Exception as e:
+                error = e
+                failed.set()
+            finally:
+                for work_queue in work_queues:
+                    send(work_queue, None)
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error = error or e
+
+        if error is not None:
+            log.error(f"Load failed: {error}")
+            for written in results:
+                for partition_file in written:
+                    partition_file.discard()
+            return False
+
+        partition_files = [partition_file for written in results for partition_file in written]
+        if not partition_files:
+            log.warning("No items to write to CSV file.")
+            return True
+        try:
+            manifest = self.publish_partitions(partition_files)
+        except Exception as e:
+            log.error(f"Publishing the partition files failed: {e}")
+            for partition_file in partition_files:
+                partition_file.discard()
+            return False
+        log.info(f"Successfully wrote {manifest['total_rows']} records into {len(partition_files)} files "
+                 f"({len(assignment)} partitions) in '{self.path}', manifest '{self.manifest_path}'.")
+        return True
+
+    def load(self, data: dict) -> bool:
+        """
+        Load data into the CSV file.
+        
+        :param data: Dictionary containing 'items' list with data to write
+        :return: True if successful, False otherwise
+        """
+        return self.load_batches([data.get('items', [])])
@@ -1,11 +1,19 @@
 ########################################################################################################################
 # Class to Load data into the D3 Business Objects system.                                                              #
 ########################################################################################################################
+import datetime
+import gzip
+import json
 import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
+from scripts.utils.metadata_cache import get_cached_model, invalidate_model, store_models
 
 
 ########################################################################################################################
@@ -14,6 +22,12 @@ from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
 # Setup Logger
 log = logging.getLogger(__name__)
 
+# Compact encoder shared by all $batch payloads, dates and decimals are written as strings
+PAYLOAD_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, allow_nan=False, default=str)
+
+# Item statuses which are retried: timeout, lock conflicts, throttling and server errors
+RETRY_STATUS = [408, 409, 423, 429, 500, 502, 503, 504]
+
 class ETLLoadD3BusinessObjects(ETLLoadBase):
     def __init__(self, config):
         super().__init__(config)
@@ -27,9 +41,32 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
             "definition": config.get("entity", {}).get("definition", {})
         }
         self.batch_size = config.get("batch_size", 1)
+        self.concurrency = max(1, config.get("concurrency", 1))
+        self.retry_attempts = config.get("retry", {}).get("max_attempts", 5)
+        self.retry_backoff = config.get("retry", {}).get("backoff", 1.0)
+        self.retry_max_backoff = config.get("retry", {}).get("max_backoff", 60.0)
+        self.dead_letter_file = config.get("dead_letter_file", "")
+        self.adaptive_batch = bool(config.get("adaptive_batch"))
+        self.min_batch_size = config.get("adaptive_batch", {}).get("min_size", 1)
+        self.max_batch_size = config.get("adaptive_batch", {}).get("max_size", 100)
+        self.target_payload_bytes = config.get("adaptive_batch", {}).get("target_bytes", 1024 * 1024)
+        self.target_latency = config.get("adaptive_batch", {}).get("target_latency", 5.0)
+        self.current_batch_size = self.batch_size if self.batch_size > 0 else 100
+        if self.adaptive_batch:
+            self.current_batch_size = max(self.min_batch_size, min(self.max_batch_size, self.current_batch_size))
+        self.batch_sizes = []
+        self.batch_size_ceiling = 0
+        self.compress_payload = config.get("compress_payload", False)
+        self.metadata_ttl = config.get("metadata_cache", {}).get("ttl", 600)
+        self.metadata_cache_file = config.get("metadata_cache", {}).get("file", "")
         self.truncate_entity_before_load = config.get("truncate_before_load", False)
         self.mapping = config.get("mapping", {})
 
+        # Keep-alive connections for all requests, one per in-flight $batch request
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max(10, self.concurrency)))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=max(10, self.concurrency)))
+
         log.info(f"Initialized ETLLoadD3BusinessObjects with name: {self.name}")
     
     
@@ -61,11 +98,17 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
         return True
     
     def check_model_exists(self) -> tuple[bool, dict]:
-        # Check if the model exists in D3 Business Objects
+        # Check if the model exists in D3 Business Objects, models fetched by earlier loaders are taken from the cache
+        cached_model = get_cached_model(self.base_url, self.model, self.metadata_ttl, self.metadata_cache_file)
+        if cached_model is not None:
+            self.model_id = cached_model.get("id", "")
+            log.info(f"Model '{self.model}' exists with ID: {self.model_id} (cached)")
+            return True, cached_model
         url: str = f"/businessobjects/core/models/customModels"
         success, response = self.execute_request("GET", url)
         if success:
             log.debug(f"Model check response: {response}")
+            store_models(self.base_url, response.get("value", []), self.metadata_cache_file)
             for model in response.get("value", []):
                 model_name = model.get("name", "")
                 log.debug(f"Checking model: {model_name}")
@@ -74,6 +117,7 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
                     log.info(f"Model '{self.model}' exists with ID: {model_id}")
                     self.model_id = model_id
                     return True, model
+        return False, {}
     
     def check_entity_exists(self, model_data: dict) -> tuple[bool, dict]:
         log.debug(f"Checking for entity '{self.entity['name']}' in model data.")
@@ -97,27 +141,33 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
             log.error(f"Failed to create entity '{self.entity['name']}' in model '{self.model}'.")
             return False
         log.info(f"Entity '{self.entity['name']}' created successfully in model '{self.model}'.")
+        # The cached entity types of the model are outdated now
+        invalidate_model(self.base_url, self.model, self.metadata_cache_file)
 
         return True
 
     
-    def execute_request(self, method: str, endpoint: str, data: dict = None) -> tuple[bool, dict]:
-        # Execute HTTP request to D3 Business Objects API
+    def execute_request(self, method: str, endpoint: str, data: dict = None, body: bytes = None) -> tuple[bool, dict]:
+        # Execute HTTP request to D3 Business Objects API, POST requests take either data or an already encoded JSON body
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Accept": "application/json"
         }
-        if data:
+        if data or body:
             headers["Content-Type"] = "application/json"
+        if body and self.compress_payload:
+            headers["Content-Encoding"] = "gzip"
         try:
             if method.upper() == "GET":
-                response = requests.get(f"{self.base_url}{endpoint}", headers=headers)
+                response = self.session.get(f"{self.base_url}{endpoint}", headers=headers)
+            elif method.upper() == "POST" and body is not None:
+                response = self.session.post(f"{self.base_url}{endpoint}", headers=headers, data=body)
             elif method.upper() == "POST":
-                response = requests.post(f"{self.base_url}{endpoint}", headers=headers, json=data)
+                response = self.session.post(f"{self.base_url}{endpoint}", headers=headers, json=data)
             elif method.upper() == "PUT":
-                response = requests.put(f"{self.base_url}{endpoint}", headers=headers, json=data)
+                response = self.session.put(f"{self.base_url}{endpoint}", headers=headers, json=data)
             elif method.upper() == "DELETE":
-                response = requests.delete(f"{self.base_url}{endpoint}", headers=headers)
+                response = self.session.delete(f"{self.base_url}{endpoint}", headers=headers)
             else:
                 log.error(f"Unsupported HTTP method: {method}")
                 return False, {}
@@ -128,7 +178,8 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
                 return True, {}
             else:
                 log.error(f"Request to {endpoint} failed with status code {response.status_code}: {response.text}")
-                return False, {}
+                # The status lets callers tell transient from permanent failures
+                return False, {"status": response.status_code, "body": response.text}
         except Exception as e:
             log.error(f"Exception during request to {endpoint}: {e}")
         return False, {}
@@ -178,12 +229,36 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
         
         return requests
 
-    def execute_batch_request(self, requests: list) -> tuple[bool, dict]:
+    def encode_batch_payload(self, requests: list) -> bytes:
+        """
+        Encode the batch payload {"requests": [...]} directly into JSON bytes.
+        The requests are encoded one by one into a list of chunks which is joined once,
+        without building an intermediate payload dict or string. Gzip-compressed if compress_payload is set.
+
+        Args:
+            requests: List of request objects
+
+        Returns:
+            Encoded payload
+        """
+        chunks = [b'{"requests":[']
+        for index, request in enumerate(requests):
+            if index:
+                chunks.append(b",")
+            chunks.append(PAYLOAD_ENCODER.encode(request).encode("utf-8"))
+        chunks.append(b"]}")
+        body = b"".join(chunks)
+        if self.compress_payload:
+            body = gzip.compress(body, compresslevel=5)
+        return body
+
+    def execute_batch_request(self, requests: list, body: bytes = None) -> tuple[bool, dict]:
         """
         Execute a batch request to Business Objects API.
         
         Args:
             requests: List of request objects
+            body: Payload already encoded by encode_batch_payload (optional)
         
         Returns:
             Tuple of (success, response)
@@ -192,33 +267,226 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
             log.warning("No requests to execute in batch")
             return True, {}
         
-        # Build the batch payload
-        batch_payload = {
-            "requests": requests
-        }
+        # Encode the batch payload
+        if body is None:
+            try:
+                body = self.encode_batch_payload(requests)
+            except (ValueError, TypeError) as e:
+                log.error(f"Encoding the batch payload failed: {e}")
+                return False, {}
         
-        log.info(f"Executing batch request with {len(requests)} items")
-        log.debug(f"Batch payload: {batch_payload}")
+        log.info(f"Executing batch request with {len(requests)} items ({len(body)} bytes)")
+        if log.isEnabledFor(logging.DEBUG):
+            payload = gzip.decompress(body) if self.compress_payload else body
+            log.debug(f"Batch payload: {payload.decode('utf-8')}")
         
         # Execute the batch request - batch endpoint is at model level, not entity level
         endpoint = f"/businessobjects/custom/{self.model}/$batch"
-        success, response = self.execute_request("POST", endpoint, batch_payload)
+        success, response = self.execute_request("POST", endpoint, body=body)
         
         if success:
+            # Failed items are evaluated by the caller (see dispatch_batches)
             log.info(f"Batch request executed successfully")
-            
-            # Check individual responses for errors
-            if isinstance(response, dict) and "responses" in response:
-                for resp in response.get("responses", []):
-                    status = resp.get("status")
-                    if status not in [200, 201, 204]:
-                        log.warning(f"Batch item {resp.get('id')} failed with status {status}: {resp.get('body')}")
-            
             return True, response
         else:
             log.error(f"Batch request failed")
             return False, response
 
+    def write_dead_letter(self, request: dict, status: int, error):
+        """
+        Append an item which was permanently rejected together with its status and error to the dead letter file (JSON lines).
+
+        Args:
+            request: Request object of the rejected item
+            status: HTTP status of the item response
+            error: Body of the item response
+        """
+        directory = os.path.dirname(self.dead_letter_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        entry = {
+            "failed_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "status": status,
+            "error": error,
+            "url": request.get("url"),
+            "item": request.get("body")
+        }
+        with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+        log.warning(f"Item {request.get('url')} written to dead letter file '{self.dead_letter_file}' (status {status})")
+
+    def adapt_batch_size(self, items: int, payload_bytes: int, latency: float, retried: int):
+        """
+        Adjust the number of items per $batch request from the observed payload size, response time and errors.
+        Halves the size if items had to be retried and stays below 90% of that failing size from then on.
+        Otherwise moves towards the size which fits both the target payload size and the latency budget.
+        The size only grows after a batch of the current size (at most by factor 2),
+        changes below 10% are ignored to keep the size stable.
+
+        Args:
+            items: Number of items in the completed batch
+            payload_bytes: Size of the sent payload in bytes
+            latency: Response time of the batch request in seconds
+            retried: Number of items of the batch queued for retry
+        """
+        size = self.current_batch_size
+        if retried:
+            # Stay clearly below the failing size from now on
+            self.batch_size_ceiling = max(self.min_batch_size, min(self.batch_size_ceiling or items, int(items * 0.9)))
+            new_size = min(size, items // 2)
+        else:
+            bytes_per_item = max(1.0, payload_bytes / items)
+            size_by_bytes = self.target_payload_bytes / bytes_per_item
+            size_by_latency = items * self.target_latency / latency if latency > 0 else self.max_batch_size
+            new_size = int(min(size_by_bytes, size_by_latency))
+            if new_size > size:
+                # Batches sent before the last adjustment say nothing about larger sizes
+                new_size = min(new_size, size * 2) if items >= size else size
+                if self.batch_size_ceiling:
+                    new_size = max(size, min(new_size, self.batch_size_ceiling))
+            if abs(new_size - size) < max(1, size // 10):
+                new_size = size
+        new_size = max(self.min_batch_size, min(self.max_batch_size, new_size))
+        if new_size != size:
+            log.info(f"Adjusted batch size from {size} to {new_size} items "
+                     f"({payload_bytes} bytes, {latency:.2f} s, {retried} retried)")
+            self.current_batch_size = new_size
+
+    def dispatch_batches(self, batches, entity_key_field: str, entity_key_type: str) -> dict:
+        """
+        Send the batches as $batch requests with up to `concurrency` requests in flight.
+        The next batch is only built when a slot is free. After the first failed batch request
+        no further batches are sent, requests already in flight are awaited.
+
+        Items failing with a transient status (429, 5xx, lock conflicts) are queued and resent in
+        later retry batches with exponential backoff, only the failed items are resent.
+        A $batch request failing as a whole with a transient status queues all of its items the same way.
+        Items failing permanently (other 4xx or retries exhausted) are written to the dead letter file.
+
+        Args:
+            batches: Iterable of (batch number, total batches, items) tuples
+            entity_key_field: The field name that contains the entity key
+            entity_key_type: Type of the entity key (String, Guid, Int32, Int64)
+
+        Returns:
+            Dictionary with success flag and counts of succeeded, retried, failed and dead lettered items
+        """
+        result = {"success": True, "succeeded": 0, "retried": 0, "failed": 0, "dead_lettered": 0}
+        in_flight: dict = {}
+        # Entries of (due time, attempt, request)
+        retry_queue: list = []
+        retry_batches = [0]
+
+        def send(requests: list) -> tuple[bool, dict, float, int]:
+            try:
+                body = self.encode_batch_payload(requests)
+            except (ValueError, TypeError) as e:
+                # e.g. NaN values or objects the encoder does not know, the batch fails as a whole
+                log.error(f"Encoding the batch payload failed: {e}")
+                return False, {}, 0.0, 0
+            start_time = time.perf_counter()
+            success, response = self.execute_batch_request(requests, body)
+            return success, response, time.perf_counter() - start_time, len(body)
+
+        def collect(futures):
+            for future in futures:
+                batch_name, entries = in_flight.pop(future)
+                success, response, latency, payload_bytes = future.result()
+                if success:
+                    responses = {resp.get("id"): resp for resp in response.get("responses", [])} if isinstance(response, dict) else {}
+                else:
+                    batch_status = response.get("status") if isinstance(response, dict) else None
+                    if batch_status not in RETRY_STATUS:
+                        log.error(f"Batch {batch_name} failed")
+                        result["success"] = False
+                        continue
+                    # The whole $batch request failed transiently, every item gets the status of the request
+                    log.warning(f"Batch {batch_name} failed with status {batch_status}, retrying its items")
+                    responses = {request["id"]: response for request, _ in entries}
+                succeeded, retried, failed = 0, 0, 0
+                for request, attempt in entries:
+                    # Items without an individual response count as succeeded
+                    resp = responses.get(request["id"], {})
+                    status = resp.get("status", 200)
+                    if status in [200, 201, 204]:
+                        succeeded += 1
+                    elif status in RETRY_STATUS and attempt < self.retry_attempts:
+                        delay = min(self.retry_backoff * 2 ** (attempt - 1), self.retry_max_backoff)
+                        retry_queue.append((time.monotonic() + delay, attempt + 1, request))
+                        retried += 1
+                    else:
+                        failed += 1
+                        if self.dead_letter_file:
+                            self.write_dead_letter(request, status, resp.get("body"))
+                            result["dead_lettered"] += 1
+                result["succeeded"] += succeeded
+                result["retried"] += retried
+                result["failed"] += failed
+                log.info(f"Batch {batch_name} completed in {latency:.2f} s: {succeeded} succeeded, {retried} queued for retry, {failed} failed")
+                if self.adaptive_batch:
+                    self.adapt_batch_size(len(entries), payload_bytes, latency, retried)
+
+        def submit(batch_name, entries: list):
+            # Item ids only have to be unique within one $batch request
+            for number, (request, _) in enumerate(entries, start=1):
+                request["id"] = str(number)
+            requests = [request for request, _ in entries]
+            self.batch_sizes.append(len(requests))
+            in_flight[executor.submit(send, requests)] = (batch_name, entries)
+
+        def submit_due_retries():
+            while retry_queue and len(in_flight) < self.concurrency:
+                now = time.monotonic()
+                due = [entry for entry in retry_queue if entry[0] <= now][:self.current_batch_size]
+                if not due:
+                    return
+                for entry in due:
+                    retry_queue.remove(entry)
+                retry_batches[0] += 1
+                log.info(f"Retrying {len(due)} items (retry batch {retry_batches[0]})")
+                submit(f"retry {retry_batches[0]}", [(request, attempt) for _, attempt, request in due])
+
+        def wait_for_slot():
+            collect([future for future in in_flight if future.done()])
+            submit_due_retries()
+            while result["success"] and len(in_flight) >= self.concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+                submit_due_retries()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch_num, total_batches, batch in batches:
+                wait_for_slot()
+                if not result["success"]:
+                    log.error("Stopping upload after failed batch request")
+                    break
+
+                log.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} items)")
+
+                # Build batch requests
+                requests = self.build_batch_request(self.apply_mapping(batch), entity_key_field, entity_key_type)
+                if not requests:
+                    log.warning(f"No valid requests in batch {batch_num}, skipping")
+                    continue
+
+                submit(batch_num, [(request, 1) for request in requests])
+
+            # Resend the remaining failed items once their backoff has expired
+            while result["success"] and (in_flight or retry_queue):
+                wait_for_slot()
+                if not in_flight and retry_queue:
+                    time.sleep(max(0.0, min(entry[0] for entry in retry_queue) - time.monotonic()))
+                elif in_flight:
+                    timeout = max(0.0, min(entry[0] for entry in retry_queue) - time.monotonic()) if retry_queue else None
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            if in_flight:
+                done, _ = wait(in_flight)
+                collect(done)
+
+        return result
+
     def load(self, data: dict) -> bool:
         """
         Load data into D3 Business Objects using batch processing.
@@ -251,37 +519,45 @@ class ETLLoadD3BusinessObjects(ETLLoadBase):
         log.debug(f"Entity key field: {entity_key_field}, type: {entity_key_type}")
         
         # Process items in batches
-        batch_size = self.batch_size if self.batch_size > 0 else 100
         total_items = len(items)
-        success_count = 0
-        
-        for i in range(0, total_items, batch_size):
-            batch = self.apply_mapping(items[i:i + batch_size])
-            batch_num = (i // batch_size) + 1
-            total_batches = (total_items + batch_size - 1) // batch_size
-            
-            log.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} items)")
-            
-            # Build batch requests
-            requests = self.build_batch_request(batch, entity_key_field, entity_key_type)
-            
-            if not requests:
-                log.warning(f"No valid requests in batch {batch_num}, skipping")
-                continue
-            
-            # Execute batch request
-            success, response = self.execute_batch_request(requests)
-            
-            if success:
-                success_count += len(requests)
-                log.info(f"Batch {batch_num} completed successfully")
-            else:
-                log.error(f"Batch {batch_num} failed")
-                return False
-        
-        log.info(f"Successfully loaded {success_count}/{total_items} items")
-        return True
+        self.batch_sizes = []
+        self.batch_size_ceiling = 0
+        log.info(f"Uploading {total_items} items in batches of {self.current_batch_size}"
+                 f"{' (adaptive)' if self.adaptive_batch else ''} with up to {self.concurrency} concurrent requests")
+        result = self.dispatch_batches(self.split_batches(items), entity_key_field, entity_key_type)
+
+        log.info(f"Successfully loaded {result['succeeded']}/{total_items} items ({result['retried']} retries)")
+        if self.adaptive_batch and self.batch_sizes:
+            log.info(f"Adaptive batch size settled at {self.current_batch_size} items "
+                     f"(min {min(self.batch_sizes)}, max {max(self.batch_sizes)}, "
+                     f"avg {sum(self.batch_sizes) / len(self.batch_sizes):.1f} over {len(self.batch_sizes)} batches)")
+        if result["dead_lettered"]:
+            log.warning(f"{result['dead_lettered']} items could not be loaded and were written to '{self.dead_letter_file}'.")
+        if result["failed"] > result["dead_lettered"]:
+            log.error(f"{result['failed'] - result['dead_lettered']} items failed to load")
+            return False
+        return result["success"]
     
+    def split_batches(self, items: list):
+        """
+        Split the items into batches of the current batch size. The size is read again for every batch,
+        so changes of the adaptive batch size take effect immediately.
+
+        Args:
+            items: List of items to upload
+
+        Returns:
+            Generator of (batch number, estimated total batches, items) tuples
+        """
+        position = 0
+        batch_num = 0
+        while position < len(items):
+            batch_size = self.current_batch_size
+            batch_num += 1
+            total_batches = batch_num + (len(items) - position - 1) // batch_size
+            yield batch_num, total_batches, items[position:position + batch_size]
+            position += batch_size
+
     def apply_mapping(self, items: list) -> list:
         """
         Apply mapping to a single item.
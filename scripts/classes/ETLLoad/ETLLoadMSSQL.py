@@ -1,11 +1,22 @@
 ########################################################################################################################
 # Class to Load data into a MSSQL Database Table.                                                              #
 ########################################################################################################################
+import datetime
+import json
 import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import pyodbc
 
 from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
+from scripts.utils.connection_pool import get_pool
+from scripts.utils.converters import get_coercer
 
 
 ########################################################################################################################
@@ -14,6 +25,49 @@ from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
 # Setup Logger
 log = logging.getLogger(__name__)
 
+# Rows between two commits if a dead_letter_file but no commit_interval is configured,
+# limits the rows kept in memory and re-inserted when bad rows are isolated
+DEAD_LETTER_COMMIT_INTERVAL: int = 10000
+
+# Column definitions from INFORMATION_SCHEMA.COLUMNS per (server, database, table), shared by all loaders of a run
+COLUMN_CACHE: dict = {}
+
+# Identity column of the staging table recording the load order, the last loaded row per upsert key wins
+STAGING_ORDER_COLUMN: str = "ETLitRowNumber"
+
+# SQL Server data type -> (converter type, pyodbc SQL type constant)
+SQL_SERVER_TYPES: dict = {
+    "bigint": ("int", "SQL_BIGINT"),
+    "int": ("int", "SQL_INTEGER"),
+    "smallint": ("int", "SQL_SMALLINT"),
+    "tinyint": ("int", "SQL_TINYINT"),
+    "bit": ("bool", "SQL_BIT"),
+    "decimal": ("decimal", "SQL_DECIMAL"),
+    "numeric": ("decimal", "SQL_NUMERIC"),
+    "money": ("decimal", "SQL_DECIMAL"),
+    "smallmoney": ("decimal", "SQL_DECIMAL"),
+    "float": ("float", "SQL_DOUBLE"),
+    "real": ("float", "SQL_REAL"),
+    "date": ("date", "SQL_TYPE_DATE"),
+    "datetime": ("datetime", "SQL_TYPE_TIMESTAMP"),
+    "datetime2": ("datetime", "SQL_TYPE_TIMESTAMP"),
+    "smalldatetime": ("datetime", "SQL_TYPE_TIMESTAMP"),
+    "char": ("string", "SQL_CHAR"),
+    "varchar": ("string", "SQL_VARCHAR"),
+    "text": ("string", "SQL_LONGVARCHAR"),
+    "nchar": ("string", "SQL_WCHAR"),
+    "nvarchar": ("string", "SQL_WVARCHAR"),
+    "ntext": ("string", "SQL_WLONGVARCHAR"),
+    "uniqueidentifier": ("string", "SQL_GUID"),
+}
+
+# Placeholders of the insert statement: '@field@', N'@field@', @field@ or '@field'
+# (quotes and the N prefix of Unicode literals belong to the placeholder)
+PLACEHOLDER_PATTERN = re.compile(r"(?:\b[Nn])?'@(\w+)@?'|@(\w+)@")
+
+# Target table and column list of the insert statement: INSERT INTO dbo.[Table] (col1, col2, ...)
+INSERT_TARGET_PATTERN = re.compile(r"^\s*INSERT\s+INTO\s+((?:\[[^\]]*\]|[^\s(\[])+)\s*\(([^)]*)\)", re.IGNORECASE)
+
 class ETLLoadMSSQL(ETLLoadBase):
     """
     Class to Load data into a MSSQL Database Table.
@@ -33,24 +87,57 @@ class ETLLoadMSSQL(ETLLoadBase):
         self.password = config.get('connection').get('password', '')
         self.driver = config.get('connection').get('driver', '{ODBC Driver 17 for SQL Server}')
         self.connection_string = f'DRIVER={self.driver};SERVER={self.server};DATABASE={self.database};UID={self.username};PWD={self.password}'
+        self.max_connections = config.get('connection').get('max_connections')
+        self.pool = get_pool(self.connection_string, self.server, self.max_connections)
         self.mapping = config.get('mappings', {})
         self.conn = None
         self.truncate_before_load = config.get('truncate_before_load', True)
+        self.bulk_insert = config.get('bulk_insert', False)
+        self.batch_size = config.get('batch_size', 1000)
+        self.fast_executemany = config.get('fast_executemany', True)
+        self.upsert_keys = config.get('upsert', {}).get('key_columns', [])
+        self.upsert_method = config.get('upsert', {}).get('method', 'merge')
+        self.upsert_delete_missing = config.get('upsert', {}).get('delete_missing', False)
+        self.staging_table = config.get('upsert', {}).get('staging_table', '#ETLitStaging')
+        self.typed_binding = config.get('typed_binding', False)
+        self.commit_interval = config.get('commit_interval', 0)
+        self.dead_letter_file = config.get('dead_letter_file', '')
+        if self.dead_letter_file and not self.commit_interval:
+            self.commit_interval = DEAD_LETTER_COMMIT_INTERVAL
+        self.dead_letter_count = 0
+        self.dead_letter_lock = threading.Lock()
+        self.parallel_connections = config.get('parallel', {}).get('connections', 1)
+        self.table_lock = config.get('parallel', {}).get('table_lock', 'none')
+        if self.parallel_connections > 1 and self.parallel_connections > self.pool.max_connections - 1:
+            # The main connection stays checked out for the upsert, the workers must not wait for it
+            log.warning(f"Limiting parallel connections from {self.parallel_connections} to {max(1, self.pool.max_connections - 1)} (max_connections of {self.server}).")
+            self.parallel_connections = max(1, self.pool.max_connections - 1)
+        if self.parallel_connections > 1 and self.staging_table.startswith('#') and not self.staging_table.startswith('##'):
+            # Session temp tables are invisible to the worker connections, use a global temp table instead
+            self.staging_table = f"##{self.staging_table[1:]}_{uuid.uuid4().hex[:8]}"
+        self.column_types = []
 
     def connect(self):
         """
-        Establish a connection to the MSSQL database.
+        Check out a connection to the MSSQL database from the shared connection pool.
 
         :return: pyodbc Connection object
         """
         try:
-            connection = pyodbc.connect(self.connection_string)
+            connection = self.pool.acquire()
             log.info("Successfully connected to MSSQL database.")
             return connection
         except pyodbc.Error as e:
             log.error(f"Error connecting to MSSQL database: {e}")
             raise
 
+    def close(self):
+        """
+        Return the main connection to the shared connection pool. Uncommitted work is rolled back.
+        """
+        if self.conn is not None:
+            self.pool.release(self.conn)
+            self.conn = None
     
     def setup(self) -> bool:
         """
@@ -66,38 +153,538 @@ class ETLLoadMSSQL(ETLLoadBase):
                 log.info(f"Table '{table_name}' exists in the database.")
             else:
                 log.warning(f"Table '{table_name}' does not exist in the database.")
+            if self.typed_binding and (self.bulk_insert or self.upsert_keys) and not self.prepare_typed_binding(cursor):
+                # The connection is only kept for a following load, return it so it does not block a pool slot
+                self.close()
+                return False
             return True
         except Exception as e:
             log.error(f"Setup failed: {e}")
+            self.close()
             return False
 
 
+    def get_table_columns(self, cursor) -> dict:
+        """
+        Read the column definitions of the target table from INFORMATION_SCHEMA.COLUMNS.
+        The result is cached per server, database and table for all loaders of the run.
+
+        :return: Dictionary column name -> column definition
+        """
+        parts = [part.strip().strip("[]") for part in self.config.get('table', 'target_table').strip().split(".")]
+        cache_key = (self.server, self.database, ".".join(parts))
+        if cache_key in COLUMN_CACHE:
+            return COLUMN_CACHE[cache_key]
+
+        query = ("SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE, DATETIME_PRECISION, IS_NULLABLE "
+                 "FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = ?")
+        params = [parts[-1]]
+        if len(parts) > 1:
+            query += " AND TABLE_SCHEMA = ?"
+            params.append(parts[-2])
+        else:
+            # Unqualified names resolve to the default schema of the user, as in the insert statement
+            query += " AND TABLE_SCHEMA = SCHEMA_NAME()"
+        cursor.execute(query, *params)
+        columns = {}
+        for row in cursor.fetchall():
+            columns[row[0].lower()] = {
+                "name": row[0],
+                "data_type": row[1].lower(),
+                "max_length": row[2],
+                "precision": row[3],
+                "scale": row[4],
+                "datetime_precision": row[5],
+                "nullable": row[6] == "YES"
+            }
+        COLUMN_CACHE[cache_key] = columns
+        log.info(f"Cached {len(columns)} column definitions of table '{cache_key[2]}'.")
+        return columns
+
+    def prepare_typed_binding(self, cursor) -> bool:
+        """
+        Match the insert_statement columns against the table definition and prepare one coercer
+        and one input size per parameter. Mismatches are reported here, before the load starts.
+
+        :return: True if the insert columns match the table, False otherwise
+        """
+        table_columns = self.get_table_columns(cursor)
+        _, insert_columns = self.get_insert_target()
+        _, fields = self.compile_insert_statement()
+        if len(insert_columns) != len(fields):
+            log.error(f"insert_statement has {len(insert_columns)} columns but {len(fields)} placeholders, typed binding is not possible.")
+            return False
+
+        missing = [column for column in insert_columns if column.strip("[]").lower() not in table_columns]
+        if missing:
+            log.error(f"Columns {missing} of the insert_statement do not exist in table '{self.config.get('table')}'.")
+            return False
+        required = [column["name"] for name, column in table_columns.items()
+                    if not column["nullable"] and name not in [c.strip("[]").lower() for c in insert_columns]]
+        if required:
+            log.warning(f"NOT NULL columns {required} are not part of the insert_statement and need a default value.")
+
+        self.column_types = []
+        for column, field in zip(insert_columns, fields):
+            definition = table_columns[column.strip("[]").lower()]
+            type_name, sql_type = SQL_SERVER_TYPES.get(definition["data_type"], ("string", None))
+            if sql_type is None:
+                log.warning(f"Unknown data type '{definition['data_type']}' of column '{column}', value of '{field}' is bound unchanged.")
+            self.column_types.append({"field": field, "definition": definition, "coerce": get_coercer(type_name), "sql_type": sql_type})
+        log.info(f"Prepared typed binding for {len(self.column_types)} columns.")
+        return True
+
+    def get_input_sizes(self) -> list:
+        """
+        Build the setinputsizes list (sql type, size, decimal digits) for the prepared columns.
+        Returns an empty list if a column type is not known to the driver.
+        """
+        input_sizes = []
+        for column_type in self.column_types:
+            definition = column_type["definition"]
+            sql_type = getattr(pyodbc, column_type["sql_type"] or "", None)
+            if sql_type is None:
+                return []
+            if definition["data_type"] in ("decimal", "numeric"):
+                input_sizes.append((sql_type, definition["precision"], definition["scale"]))
+            elif definition["data_type"] in ("money", "smallmoney"):
+                input_sizes.append((sql_type, 19, 4))
+            elif definition["data_type"] in ("datetime", "datetime2", "smalldatetime"):
+                input_sizes.append((sql_type, 27, definition["datetime_precision"] or 0))
+            elif definition["max_length"] is not None:
+                # -1 = (max) columns
+                input_sizes.append((sql_type, max(definition["max_length"], 0), 0))
+            else:
+                input_sizes.append((sql_type, 0, 0))
+        return input_sizes
+
+    def build_typed_rows(self, items: list) -> list:
+        """
+        Convert a batch column by column into the Python types of the target columns and return the parameter rows.
+        Values which can not be converted are bound unchanged and reported once per column.
+        """
+        columns = []
+        for column_type in self.column_types:
+            coerce = column_type["coerce"]
+            values = [item.get(column_type["field"]) for item in items]
+            try:
+                columns.append([coerce(value) for value in values])
+                continue
+            except (ValueError, TypeError, ArithmeticError):
+                pass
+            converted = []
+            errors = 0
+            for value in values:
+                try:
+                    converted.append(coerce(value))
+                except (ValueError, TypeError, ArithmeticError):
+                    converted.append(value)
+                    errors += 1
+            log.warning(f"{errors} values of '{column_type['field']}' could not be converted to {column_type['definition']['data_type']}.")
+            columns.append(converted)
+        return list(zip(*columns))
+
+    def truncate_table(self, cursor):
+        """
+        Truncate the target table before loading new data.
+        """
+        table_name = self.config.get('table', 'target_table')
+        cursor.execute(f"TRUNCATE TABLE {table_name}")
+        log.info(f"Truncated table '{table_name}' before loading new data.")
+
+    def compile_insert_statement(self) -> tuple[str, list]:
+        """
+        Compile the insert_statement template once into a parameterised statement.
+        Every placeholder is replaced by '?', the returned field list names the source field
+        of each placeholder in order (resolved through the mappings).
+
+        :return: Tuple of (statement, source fields)
+        """
+        insert_statement = self.config.get('insert_statement', '')
+        source_fields = {target_field: source_field for source_field, target_field in self.mapping.items()}
+        fields = []
+
+        def to_parameter(match) -> str:
+            placeholder = match.group(1) or match.group(2)
+            fields.append(source_fields.get(placeholder, placeholder))
+            return "?"
+
+        statement = PLACEHOLDER_PATTERN.sub(to_parameter, insert_statement)
+        log.debug(f"Compiled insert statement: {statement} with fields {fields}")
+        return statement, fields
+
+    def get_insert_target(self) -> tuple[str, list]:
+        """
+        Parse target table and column list from the insert_statement.
+
+        :return: Tuple of (table, columns)
+        """
+        match = INSERT_TARGET_PATTERN.match(self.config.get('insert_statement', ''))
+        if not match:
+            raise ValueError("insert_statement must have the form 'INSERT INTO table (columns) VALUES (...)' for upserts")
+        columns = [column.strip() for column in match.group(2).split(",") if column.strip()]
+        return match.group(1), columns
+
+    def create_staging_table(self, cursor):
+        """
+        Create the session temp staging table with the columns of the target table,
+        or empty a configured permanent staging table.
+        The UNION ALL keeps SELECT INTO from copying IDENTITY properties into the staging table.
+        Both get the identity column STAGING_ORDER_COLUMN, which records the order the rows were loaded in.
+        """
+        table_name, columns = self.get_insert_target()
+        if self.staging_table.startswith("#"):
+            column_list = ", ".join(columns)
+            cursor.execute(f"IF OBJECT_ID('tempdb..{self.staging_table}') IS NOT NULL DROP TABLE {self.staging_table}")
+            cursor.execute(
+                f"SELECT TOP 0 {column_list} INTO {self.staging_table} FROM {table_name} "
+                f"UNION ALL SELECT TOP 0 {column_list} FROM {table_name}"
+            )
+            cursor.execute(f"ALTER TABLE {self.staging_table} ADD {STAGING_ORDER_COLUMN} BIGINT IDENTITY(1, 1)")
+            log.info(f"Created staging table '{self.staging_table}' for '{table_name}'.")
+        else:
+            cursor.execute(f"TRUNCATE TABLE {self.staging_table}")
+            cursor.execute(
+                f"IF COL_LENGTH('{self.staging_table}', '{STAGING_ORDER_COLUMN}') IS NULL "
+                f"ALTER TABLE {self.staging_table} ADD {STAGING_ORDER_COLUMN} BIGINT IDENTITY(1, 1)"
+            )
+            log.info(f"Truncated staging table '{self.staging_table}'.")
+
+    def build_upsert_statements(self) -> list:
+        """
+        Build the set-based statements which apply the staging table to the target table on the key columns,
+        either as one MERGE or as UPDATE followed by INSERT. Rows missing from the source are deleted
+        if delete_missing is enabled.
+        Rows with the same key are removed from the staging table first, the last loaded row wins.
+        MERGE fails if a target row matches more than one source row, UPDATE would pick any of them.
+
+        :return: List of SQL statements
+        """
+        table_name, columns = self.get_insert_target()
+        staging = self.staging_table
+        keys = [column for column in columns if column.strip("[]") in [key.strip("[]") for key in self.upsert_keys]]
+        if len(keys) != len(self.upsert_keys):
+            raise ValueError(f"Upsert key columns {self.upsert_keys} must be part of the insert_statement columns {columns}")
+        values = [column for column in columns if column not in keys]
+
+        join_condition = " AND ".join(f"target.{key} = source.{key}" for key in keys)
+        update_set = ", ".join(f"target.{column} = source.{column}" for column in values)
+        column_list = ", ".join(columns)
+        source_list = ", ".join(f"source.{column}" for column in columns)
+        key_list = ", ".join(keys)
+
+        statements = [
+            f"WITH ranked AS (SELECT ROW_NUMBER() OVER (PARTITION BY {key_list} ORDER BY {STAGING_ORDER_COLUMN} DESC) AS row_rank "
+            f"FROM {staging}) DELETE FROM ranked WHERE row_rank > 1"
+        ]
+        if self.upsert_method == 'merge':
+            statement = f"MERGE INTO {table_name} WITH (HOLDLOCK) AS target USING {staging} AS source ON {join_condition}"
+            if values:
+                statement += f" WHEN MATCHED THEN UPDATE SET {update_set}"
+            statement += f" WHEN NOT MATCHED BY TARGET THEN INSERT ({column_list}) VALUES ({source_list})"
+            if self.upsert_delete_missing:
+                statement += " WHEN NOT MATCHED BY SOURCE THEN DELETE"
+            statements.append(statement + ";")
+            return statements
+
+        if values:
+            statements.append(f"UPDATE target SET {update_set} FROM {table_name} AS target INNER JOIN {staging} AS source ON {join_condition}")
+        statements.append(
+            f"INSERT INTO {table_name} ({column_list}) SELECT {source_list} FROM {staging} AS source "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS target WHERE {join_condition})"
+        )
+        if self.upsert_delete_missing:
+            statements.append(f"DELETE target FROM {table_name} AS target WHERE NOT EXISTS (SELECT 1 FROM {staging} AS source WHERE {join_condition})")
+        return statements
+
+    def apply_upsert(self, cursor):
+        """
+        Apply the staging table to the target table and drop a temp staging table afterwards.
+        """
+        for statement in self.build_upsert_statements():
+            log.debug(f"Executing upsert statement: {statement}")
+            cursor.execute(statement)
+            log.info(f"Upsert statement affected {cursor.rowcount} rows.")
+        if self.staging_table.startswith("#"):
+            cursor.execute(f"DROP TABLE {self.staging_table}")
+
+    def drop_staging_table(self):
+        """
+        Drop a temp staging table after a failed upsert. A committed global temp staging table (##)
+        of a parallel load would otherwise stay in tempdb as long as its pooled connection is open.
+        """
+        if not self.staging_table.startswith("#"):
+            return
+        try:
+            self.conn.rollback()
+            self.conn.cursor().execute(f"IF OBJECT_ID('tempdb..{self.staging_table}') IS NOT NULL DROP TABLE {self.staging_table}")
+            self.conn.commit()
+        except Exception as e:
+            log.warning(f"Could not drop staging table '{self.staging_table}': {e}")
+
+    def write_dead_letter(self, item: dict, error: Exception):
+        """
+        Append a row which could not be loaded together with its error to the dead letter file (JSON lines).
+        """
+        directory = os.path.dirname(self.dead_letter_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        entry = {"failed_at": datetime.datetime.now().isoformat(timespec="seconds"), "error": str(error), "item": item}
+        with self.dead_letter_lock:
+            with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self.dead_letter_count += 1
+        log.warning(f"Row written to dead letter file '{self.dead_letter_file}': {error}")
+
+    def insert_isolating(self, connection, cursor, statement: str, rows: list, items: list) -> int:
+        """
+        Insert rows which failed as a whole by bisecting them: every half that succeeds is committed,
+        halves that fail are split again until the single bad rows are found and written to the dead letter file.
+
+        :return: Number of inserted rows
+        """
+        try:
+            cursor.executemany(statement, rows)
+            connection.commit()
+            return len(rows)
+        except Exception as e:
+            connection.rollback()
+            if len(rows) == 1:
+                self.write_dead_letter(items[0], e)
+                return 0
+        middle = len(rows) // 2
+        return (self.insert_isolating(connection, cursor, statement, rows[:middle], items[:middle])
+                + self.insert_isolating(connection, cursor, statement, rows[middle:], items[middle:]))
+
+    def prepare_cursor(self, connection):
+        """
+        Create a cursor for executemany with fast_executemany and the input sizes of the typed binding.
+        """
+        cursor = connection.cursor()
+        cursor.fast_executemany = self.fast_executemany
+        if self.column_types:
+            input_sizes = self.get_input_sizes()
+            if input_sizes:
+                cursor.setinputsizes(input_sizes)
+        return cursor
+
+    def build_chunks(self, batches, fields: list):
+        """
+        Split the batches into chunks of `batch_size` and build their parameter rows.
+
+        :return: Generator of (rows, items) tuples
+        """
+        for batch in batches:
+            for i in range(0, len(batch), self.batch_size):
+                items = batch[i:i + self.batch_size]
+                if self.column_types:
+                    rows = self.build_typed_rows(items)
+                else:
+                    rows = [tuple(item.get(field) for field in fields) for item in items]
+                yield rows, items
+
+    def insert_chunks(self, connection, cursor, statement: str, chunks) -> int:
+        """
+        Insert the chunks with executemany on the given connection. Commits every `commit_interval` rows
+        and isolates bad rows if a dead_letter_file is configured. Rows after the last interval are left
+        uncommitted for the caller.
+
+        :return: Number of inserted rows
+        """
+        total_rows = 0
+        pending_count = 0
+        # Rows (and their items) inserted since the last commit, only kept to isolate bad rows
+        pending_rows = []
+        pending_items = []
+        for rows, items in chunks:
+            try:
+                cursor.executemany(statement, rows)
+            except Exception as e:
+                if not self.dead_letter_file:
+                    raise
+                log.warning(f"Inserting {len(rows)} rows failed, isolating bad rows: {e}")
+                connection.rollback()
+                total_rows += self.insert_isolating(connection, cursor, statement, pending_rows + rows, pending_items + items)
+                pending_count, pending_rows, pending_items = 0, [], []
+                continue
+            pending_count += len(rows)
+            if self.dead_letter_file:
+                pending_rows.extend(rows)
+                pending_items.extend(items)
+            log.debug(f"Inserted {len(rows)} rows ({total_rows + pending_count} total)")
+            if self.commit_interval and pending_count >= self.commit_interval:
+                connection.commit()
+                total_rows += pending_count
+                log.info(f"Committed {total_rows} rows.")
+                pending_count, pending_rows, pending_items = 0, [], []
+        return total_rows + pending_count
+
+    def insert_parallel(self, statement: str, chunks) -> int:
+        """
+        Insert the chunks concurrently over `parallel_connections` worker connections.
+        Each worker takes disjoint chunks from a bounded queue and commits its own work.
+        The first failing worker stops the distribution of further chunks.
+        If building the chunks fails, the workers fail too and their uncommitted rows are rolled back on release.
+
+        :return: Number of inserted rows
+        """
+        chunk_queue = queue.Queue(maxsize=self.parallel_connections * 2)
+        failed = threading.Event()
+        aborted = threading.Event()
+
+        def queued_chunks():
+            while True:
+                chunk = chunk_queue.get()
+                if chunk is None:
+                    if aborted.is_set():
+                        raise RuntimeError("the chunks to load could not be built")
+                    return
+                yield chunk
+
+        def worker(number: int) -> int:
+            connection = self.connect()
+            try:
+                rows = self.insert_chunks(connection, self.prepare_cursor(connection), statement, queued_chunks())
+                connection.commit()
+                log.info(f"Load worker {number} committed {rows} rows.")
+                return rows
+            except Exception as e:
+                log.error(f"Load worker {number} failed: {e}")
+                failed.set()
+                raise
+            finally:
+                self.pool.release(connection)
+
+        def send(chunk):
+            while True:
+                try:
+                    chunk_queue.put(chunk, timeout=0.5)
+                    return
+                except queue.Full:
+                    if failed.is_set():
+                        # Nobody may consume the remaining chunks anymore, make room for the stop markers
+                        while not chunk_queue.empty():
+                            chunk_queue.get_nowait()
+
+        log.info(f"Loading with {self.parallel_connections} parallel connections (table lock: {self.table_lock}).")
+        with ThreadPoolExecutor(max_workers=self.parallel_connections) as executor:
+            futures = [executor.submit(worker, number) for number in range(1, self.parallel_connections + 1)]
+            try:
+                for chunk in chunks:
+                    if failed.is_set():
+                        break
+                    send(chunk)
+            except Exception:
+                aborted.set()
+                raise
+            finally:
+                for _ in futures:
+                    send(None)
+            return sum(future.result() for future in futures)
+
+    def get_insert_statement(self, statement: str) -> str:
+        """
+        Redirect the compiled insert statement into the staging table (upsert mode)
+        and add the TABLOCK hint if configured.
+        """
+        def rewrite(match) -> str:
+            table_name = self.staging_table if self.upsert_keys else match.group(1)
+            if self.table_lock == 'tablock':
+                table_name = f"{table_name} WITH (TABLOCK)"
+            return match.group(0).replace(match.group(1), table_name, 1)
+
+        return INSERT_TARGET_PATTERN.sub(rewrite, statement, count=1)
+
+    def load_batches(self, batches) -> bool:
+        """
+        Load batches of items with the parameterised insert statement.
+        Rows are bound in chunks of `batch_size` through executemany (with fast_executemany),
+        so each chunk is a single round trip instead of one per row.
+        In upsert mode the rows go into the staging table first and are applied with one set-based upsert.
+        With commit_interval the inserted rows are committed every n rows. With a dead_letter_file a failing chunk
+        is bisected to isolate the bad rows, which are written to the dead letter file while the good rows are committed.
+        With parallel connections the chunks are inserted concurrently by worker connections (see insert_parallel).
+        Falls back to the row-wise load if neither bulk_insert nor upsert is configured.
+        """
+        if not self.bulk_insert and not self.upsert_keys:
+            return super().load_batches(batches)
+        try:
+            cursor = self.conn.cursor()
+            statement, fields = self.compile_insert_statement()
+            if self.upsert_keys:
+                self.create_staging_table(cursor)
+            elif self.truncate_before_load:
+                self.truncate_table(cursor)
+            statement = self.get_insert_statement(statement)
+
+            if self.commit_interval or self.dead_letter_file or self.parallel_connections > 1:
+                # A rollback while isolating bad rows must not undo the truncate or drop the staging table,
+                # worker connections must not wait for the truncate
+                self.conn.commit()
+
+            start_time = time.perf_counter()
+            chunks = self.build_chunks(batches, fields)
+            if self.parallel_connections > 1:
+                total_rows = self.insert_parallel(statement, chunks)
+            else:
+                cursor = self.prepare_cursor(self.conn)
+                total_rows = self.insert_chunks(self.conn, cursor, statement, chunks)
+            if self.dead_letter_count:
+                log.warning(f"{self.dead_letter_count} rows could not be loaded and were written to '{self.dead_letter_file}'.")
+            if self.upsert_keys:
+                self.apply_upsert(cursor)
+            self.conn.commit()
+            duration = time.perf_counter() - start_time
+            log.info(f"Data loaded successfully: {total_rows} rows in {duration:.2f} seconds.")
+            return True
+        except Exception as e:
+            log.error(f"Load failed: {e}")
+            if self.upsert_keys:
+                self.drop_staging_table()
+            return False
+        finally:
+            self.close()
+
     def load(self, data: dict) -> bool:
         """
         Load data into the MSSQL database table.
         """
+        if self.bulk_insert or self.upsert_keys:
+            return self.load_batches([data.get('items', [])])
         try:
             cursor = self.conn.cursor()
 
             if self.truncate_before_load:
-                table_name = self.config.get('table', 'target_table')
-                cursor.execute(f"TRUNCATE TABLE {table_name}")
-                log.info(f"Truncated table '{table_name}' before loading new data.")
+                self.truncate_table(cursor)
+
+            if self.commit_interval or self.dead_letter_file:
+                self.conn.commit()
 
             insert_statement = self.config.get('insert_statement', '')
             # for each entry (dict) in data['items'], format and execute the insert statement
-            for item in data.get('items', []):
+            for index, item in enumerate(data.get('items', []), start=1):
                 formatted_statement = insert_statement
                 for key, value in item.items():
                     mapping_field = self.mapping.get(key, key)
                     formatted_statement = formatted_statement.replace(f"@{mapping_field}@", f"{value}")
                 log.debug(f"Formatted insert statement: {formatted_statement}")
+                if self.dead_letter_file:
+                    try:
+                        cursor.execute(formatted_statement)
+                        self.conn.commit()
+                    except Exception as e:
+                        self.conn.rollback()
+                        self.write_dead_letter(item, e)
+                    continue
                 cursor.execute(formatted_statement)
+                if self.commit_interval and index % self.commit_interval == 0:
+                    self.conn.commit()
+                    log.info(f"Committed {index} rows.")
             self.conn.commit()
             log.info("Data loaded successfully.")
-            # Close connection
-            self.conn.close()
             return True
         except Exception as e:
             log.error(f"Load failed: {e}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            self.close()
@@ -29,6 +29,16 @@ class ETLTransformBase:
     def transform(self, data: dict) -> dict:
         raise NotImplementedError("Transform method must be implemented by subclasses.")
 
+    def transform_batches(self, batches):
+        """
+        Transforms a stream of batches (lists of item dictionaries) and yields the transformed batches.
+        The default implementation collects all batches and calls transform() once on the whole dataset.
+        """
+        items = []
+        for batch in batches:
+            items.extend(batch)
+        yield self.transform({"items": items}).get("items", [])
+
     def save_debug_data(self, data: dict):
         """
         Saves the extracted data to a debug file
@@ -37,5 +47,5 @@ class ETLTransformBase:
         now = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         debug_file: str = f"debug/{self.name}_{now}_debug_data_transform.json"
         with open(debug_file, "w") as f:
-            json.dump(data, f, indent=4)
+            json.dump(data, f, indent=4, default=str)
         log.debug(f"Saved debug data to {debug_file}")
\ No newline at end of file
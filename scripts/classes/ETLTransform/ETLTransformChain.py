@@ -0,0 +1,163 @@
+###################################################################################################
+# ETLTransformChain to execute several transformations one after the other                        #
+###################################################################################################
+import logging
+import time
+
+from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
+
+
+########################################################################################################################
+#                                                          Setup                                                       #
+########################################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+
+class ETLTransformChain(ETLTransformBase):
+    """
+    ETL Transform class to execute an ordered list of transformations as a chain.
+    Batches flow through all steps one after the other; per step the duration and the number of items
+    in and out are measured and logged.
+    Inherits from ETLTransformBase.
+    """
+
+    def __init__(self, config: list, steps: list):
+        """
+        Initialize ETLTransformChain with the configuration list and the created transformers of the steps.
+
+        Args:
+            config (list): List of configuration dictionaries of the steps.
+            steps (list): Transformer of every (fused) step.
+        """
+        super().__init__(config)
+        self.name = "ETLTransformChain"
+        self.steps: list = steps
+        self.stats: list = []
+
+        log.info(f"Initialized ETLTransformChain with {len(config)} transformations in {len(steps)} steps")
+
+    def __str__(self):
+        return f"ETLTransformChain with steps: {[step.name for step in self.steps]}"
+
+    @staticmethod
+    def fuse_configs(configs: list) -> list:
+        """
+        Merges adjacent transformations of type "operators" into one, so their row operators
+        are compiled into a single function and a batch is traversed only once for all of them.
+
+        Returns:
+            List of configuration dictionaries of the steps.
+        """
+        fused: list = []
+        for config in configs:
+            previous = fused[-1] if fused else None
+            if previous is not None and previous.get("type") == "operators" and config.get("type") == "operators":
+                fused[-1] = {
+                    "type": "operators",
+                    "name": f"{previous.get('name', 'ETLTransformOperators')} + {config.get('name', 'ETLTransformOperators')}",
+                    "debug": previous.get("debug", False) or config.get("debug", False),
+                    "operations": previous.get("operations", []) + config.get("operations", []),
+                }
+                log.info(f"Fused operators transformation '{config.get('name', 'ETLTransformOperators')}' into the previous step")
+            else:
+                fused.append(config)
+        return fused
+
+    @staticmethod
+    def measure_input(batches, stats: dict):
+        """
+        Passes the input batches of a step through, counts the items and measures the time spent upstream.
+        """
+        iterator = iter(batches)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                stats["upstream"] += time.perf_counter() - start_time
+                return
+            stats["upstream"] += time.perf_counter() - start_time
+            stats["in"] += len(batch)
+            yield batch
+
+    @staticmethod
+    def measure_output(batches, stats: dict):
+        """
+        Passes the output batches of a step through, counts the items and measures the time until each batch is ready.
+        """
+        iterator = iter(batches)
+        while True:
+            start_time = time.perf_counter()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                stats["total"] += time.perf_counter() - start_time
+                return
+            stats["total"] += time.perf_counter() - start_time
+            stats["out"] += len(batch)
+            yield batch
+
+    def log_stats(self):
+        """
+        Logs duration and item counts of every step.
+        """
+        for index, (step, stats) in enumerate(zip(self.steps, self.stats), start=1):
+            duration = stats["total"] - stats["upstream"]
+            log.info(f"Transformation step {index} ({step.name}): {stats['in']} items in, {stats['out']} items out, {duration:.2f} seconds")
+
+    def transform_batches(self, batches):
+        """
+        Transform a stream of batches with all steps of the chain.
+
+        Args:
+            batches: Iterable of lists of item dictionaries.
+
+        Returns:
+            Generator of lists of transformed item dictionaries.
+        """
+        self.stats = [{"in": 0, "out": 0, "upstream": 0.0, "total": 0.0} for _ in self.steps]
+        for step, stats in zip(self.steps, self.stats):
+            batches = self.measure_output(step.transform_batches(self.measure_input(batches, stats)), stats)
+        yield from batches
+        self.log_stats()
+
+    def transform(self, data: dict) -> dict:
+        """
+        Transform data with all steps of the chain, one after the other.
+
+        Args:
+            data (dict): Dictionary of data items to be transformed.
+
+        Returns:
+            dict: Transformed data items.
+        """
+        self.stats = []
+        for step in self.steps:
+            stats = {"in": len(data.get("items", [])), "out": 0, "upstream": 0.0, "total": 0.0}
+            start_time = time.perf_counter()
+            data = step.transform(data)
+            stats["total"] = time.perf_counter() - start_time
+            stats["out"] = len(data.get("items", []))
+            self.stats.append(stats)
+        self.log_stats()
+        return data
+
+    def setup(self) -> bool:
+        """
+        Setup method for ETLTransformChain.
+        Sets up all steps of the chain.
+        Returns:
+            bool: True if the setup of all steps is successful, False otherwise.
+        """
+        if not self.steps:
+            log.error("No transformations specified in the chain.")
+            return False
+
+        for index, step in enumerate(self.steps, start=1):
+            if not step.setup():
+                log.error(f"Setup of transformation step {index} ({step.name}) failed.")
+                return False
+
+        log.info("ETLTransformChain setup completed successfully.")
+        return True
@@ -2,8 +2,11 @@
 # ETLTransformHookFunction to execute a custom hook function for data transformation              #
 ###################################################################################################
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
+from scripts.utils.hook_cache import get_hook_function
 
 
 ########################################################################################################################
@@ -12,6 +15,64 @@ from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
 # Setup Logger
 log = logging.getLogger(__name__)
 
+# Items per chunk shipped to a worker process if not configured otherwise
+DEFAULT_CHUNK_SIZE: int = 5000
+
+# Hook state of a worker process, set by init_worker
+WORKER: dict = {}
+
+
+########################################################################################################################
+#                                                    Worker functions                                                  #
+########################################################################################################################
+def pack_items(items: list) -> tuple:
+    """
+    Packs items for the transfer to or from a worker process. If all items have the same keys in the same order,
+    the keys are sent once and the items as value tuples, which pickles much smaller and faster than dicts.
+    """
+    if not items:
+        return None, []
+    fields = tuple(items[0])
+    # Compared in order, the values of every row are unpacked against the field order of the first item
+    if all(tuple(item) == fields for item in items):
+        return fields, [tuple(item.values()) for item in items]
+    return None, items
+
+
+def unpack_items(packed: tuple) -> list:
+    """
+    Unpacks items packed by pack_items.
+    """
+    fields, rows = packed
+    if fields is None:
+        return rows
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def init_worker(hook_file: str, function_name: str, init_function: str, mode: str, config: dict):
+    """
+    Initializer of a worker process: loads the hook module once and calls its init function.
+    """
+    WORKER["function"] = get_hook_function(hook_file, function_name)
+    WORKER["mode"] = mode
+    WORKER["config"] = config
+    init = get_hook_function(hook_file, init_function)
+    if init is not None:
+        init(config)
+
+
+def run_hook_chunk(packed: tuple) -> tuple:
+    """
+    Runs the hook of the worker process on a chunk of packed items and returns the packed result.
+    """
+    items = unpack_items(packed)
+    if WORKER["mode"] == "batch":
+        result = WORKER["function"](items, WORKER["config"])
+        items = result if isinstance(result, list) else list(result or [])
+    else:
+        items = WORKER["function"]({"items": items}, WORKER["config"]).get("items", [])
+    return pack_items(items)
+
 
 class ETLTransformHookFunction(ETLTransformBase):
     """
@@ -30,14 +91,28 @@ class ETLTransformHookFunction(ETLTransformBase):
         self.name = config.get("name", "ETLTransformHookFunction")
         self.hook_file = config.get("hook_file", "")
         self.function_name = config.get("function_name", "")
+        self.mode = config.get("mode", "dataset")
+        self.init_function = config.get("init_function", "init")
+        self.finalize_function = config.get("finalize_function", "finalize")
+        self.row_local = config.get("row_local", False)
+        self.processes = config.get("processes", 1)
+        self.chunk_size = config.get("chunk_size", DEFAULT_CHUNK_SIZE)
         self.debug = config.get("debug", False)
         self.config = config.get("config", {})
 
         log.info(f"Initialized ETLTransformHookFunction with hook file: {self.hook_file} and function: {self.function_name}")
 
+    def is_parallel(self) -> bool:
+        """
+        Returns True if the hook is run in a process pool.
+        """
+        return self.row_local and self.processes > 1
+
     def transform(self, data: dict) -> dict:
         """
         Execute the custom hook function to transform data.
+        In batch mode the whole dataset is passed to the batch hook as a single batch.
+        Row-local hooks with more than one process are run in parallel on chunks of the items.
 
         Args:
             data (dict): Dictionary of data items to be transformed.
@@ -45,14 +120,20 @@ class ETLTransformHookFunction(ETLTransformBase):
         Returns:
             dict: Transformed data items.
         """
+        if self.mode == "batch" or self.is_parallel():
+            try:
+                transformed_data = {"items": [item for batch in self.transform_batches([data.get("items", [])]) for item in batch]}
+                if self.debug:
+                    self.save_debug_data(transformed_data)
+                return transformed_data
+            except Exception as e:
+                log.error(f"Error executing hook function '{self.function_name}': {e}")
+                return data  # Return original data in case of error
         try:
-            # Dynamically import the hook function
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("transform_hooks", self.hook_file)
-            hook_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(hook_module)
-
-            hook_function = getattr(hook_module, self.function_name)
+            # Import the hook function, the hook module is compiled and executed only once per run
+            hook_function = get_hook_function(self.hook_file, self.function_name)
+            if hook_function is None:
+                raise AttributeError(f"Hook file {self.hook_file} has no function '{self.function_name}'")
 
             # Execute the hook function
             transformed_data = hook_function(data, self.config)
@@ -66,6 +147,94 @@ class ETLTransformHookFunction(ETLTransformBase):
             return data  # Return original data in case of error
 
 
+    def transform_batches(self, batches):
+        """
+        Transform a stream of batches with the hook.
+        Whole-dataset hooks (mode "dataset") receive all items at once, see ETLTransformBase.transform_batches.
+
+        In mode "batch" the hook function is called for every batch as function(items, config) and returns
+        the transformed items as list, or is a generator yielding them. Items may be changed in place.
+        If the hook module defines init(config) and finalize(), they are called before the first and after the last batch;
+        items returned by finalize() (e.g. the result of a stateful dedupe) are emitted as last batch.
+
+        Args:
+            batches: Iterable of lists of item dictionaries.
+
+        Returns:
+            Generator of lists of transformed item dictionaries.
+        """
+        if self.is_parallel():
+            yield from self.transform_parallel(batches)
+            return
+        if self.mode != "batch":
+            yield from super().transform_batches(batches)
+            return
+
+        hook_function = get_hook_function(self.hook_file, self.function_name)
+        if hook_function is None:
+            raise AttributeError(f"Hook file {self.hook_file} has no function '{self.function_name}'")
+        init_function = get_hook_function(self.hook_file, self.init_function)
+        finalize_function = get_hook_function(self.hook_file, self.finalize_function)
+
+        if init_function is not None:
+            init_function(self.config)
+        items_in, items_out = 0, 0
+        for batch in batches:
+            items_in += len(batch)
+            result = hook_function(batch, self.config)
+            items = result if isinstance(result, list) else list(result or [])
+            items_out += len(items)
+            if items:
+                yield items
+        if finalize_function is not None:
+            items = list(finalize_function() or [])
+            items_out += len(items)
+            if items:
+                yield items
+        log.info(f"Data transformed using batch hook function {self.function_name}: {items_in} items in, {items_out} items out")
+
+    def transform_parallel(self, batches):
+        """
+        Transform a stream of batches with a row-local hook in a pool of worker processes.
+        Batches are split into chunks of chunk_size items, at most two chunks per process are in flight.
+        The results are yielded in the order of the input, so the output is the same as in a single process.
+        A row-local hook transforms every item independently of all other items (no dedupe, no sorting),
+        in dataset mode it is called once per chunk. finalize() is not called, the hook state lives in the workers.
+
+        Args:
+            batches: Iterable of lists of item dictionaries.
+
+        Returns:
+            Generator of lists of transformed item dictionaries.
+        """
+        if get_hook_function(self.hook_file, self.function_name) is None:
+            raise AttributeError(f"Hook file {self.hook_file} has no function '{self.function_name}'")
+
+        pending: deque = deque()
+        items_in, items_out = 0, 0
+        log.info(f"Running row-local hook function {self.function_name} in {self.processes} processes")
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=init_worker,
+                                 initargs=(self.hook_file, self.function_name, self.init_function, self.mode, self.config)) as pool:
+            try:
+                for batch in batches:
+                    items_in += len(batch)
+                    for start in range(0, len(batch), self.chunk_size):
+                        pending.append(pool.submit(run_hook_chunk, pack_items(batch[start:start + self.chunk_size])))
+                        while len(pending) >= self.processes * 2:
+                            items = unpack_items(pending.popleft().result())
+                            items_out += len(items)
+                            if items:
+                                yield items
+                while pending:
+                    items = unpack_items(pending.popleft().result())
+                    items_out += len(items)
+                    if items:
+                        yield items
+            finally:
+                for future in pending:
+                    future.cancel()
+        log.info(f"Data transformed using hook function {self.function_name} in {self.processes} processes: {items_in} items in, {items_out} items out")
+
     def setup(self) -> bool:
         """
         Setup method for ETLTransformHookFunction.
@@ -82,6 +251,13 @@ class ETLTransformHookFunction(ETLTransformBase):
             log.error("Function name is not specified in configuration.")
             return False
 
+        if self.mode not in ("dataset", "batch"):
+            log.error(f"Unsupported hook mode '{self.mode}', use 'dataset' or 'batch'.")
+            return False
+
+        if self.processes > 1 and not self.row_local:
+            log.warning(f"Hook function {self.function_name} is not declared as row_local, ignoring processes: {self.processes}")
+
         log.info("ETLTransformHookFunction setup completed successfully.")
         return True
 
@@ -0,0 +1,241 @@
+###################################################################################################
+# ETLTransformLookup to enrich or join items with reference data of other sources                 #
+###################################################################################################
+import hashlib
+import json
+import logging
+
+from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
+from scripts.utils.reference_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL, get_cache_file, get_reference, store_reference
+
+
+########################################################################################################################
+#                                                          Setup                                                       #
+########################################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+JOIN_TYPES: list = ["left", "inner"]
+MATCH_TYPES: list = ["first", "all"]
+
+
+class ETLTransformLookup(ETLTransformBase):
+    """
+    ETL Transform class to enrich or join items with reference datasets.
+    Every reference dataset is loaded with any extractor (or taken from the reference cache) and indexed by its key,
+    the items are then looked up in the index batch by batch. Lookups are applied in the configured order,
+    so a lookup can use fields added by a previous one.
+    Inherits from ETLTransformBase.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize ETLTransformLookup with configuration.
+
+        Args:
+            config (dict): Configuration dictionary for the transform.
+        """
+        super().__init__(config)
+        self.name = config.get("name", "ETLTransformLookup")
+        self.lookups: list = config.get("lookups", [])
+        self.cache_config: dict = config.get("cache", {})
+        self.ttl = self.cache_config.get("ttl", DEFAULT_TTL)
+        self.max_entries = self.cache_config.get("max_entries", DEFAULT_MAX_ENTRIES)
+        self.cache_dir = self.cache_config.get("dir", "")
+        self.debug = config.get("debug", False)
+        self.indexes: dict = {}
+
+        log.info(f"Initialized ETLTransformLookup with {len(self.lookups)} lookups")
+
+    @staticmethod
+    def get_key_fields(lookup: dict) -> tuple[list, list]:
+        """
+        Returns the key fields of the items and of the reference dataset of a lookup.
+        """
+        key = lookup.get("key", [])
+        key = key if isinstance(key, list) else [key]
+        reference_key = lookup.get("reference_key", key)
+        reference_key = reference_key if isinstance(reference_key, list) else [reference_key]
+        return key, reference_key
+
+    @staticmethod
+    def get_cache_key(lookup: dict) -> str:
+        """
+        Returns the reference cache key of a lookup: its name and a hash of its source configuration,
+        so a changed source is loaded again and no credentials end up in the cache.
+        """
+        source = json.dumps(lookup.get("source", {}), sort_keys=True, default=str)
+        return f"{lookup['name']}|{hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]}"
+
+    def load_reference(self, lookup: dict) -> list:
+        """
+        Returns the items of the reference dataset of a lookup: cached if the cache entry is younger than the ttl,
+        otherwise extracted from the configured source and cached.
+        A failed extraction raises instead of being cached as an empty dataset,
+        an empty dataset is only accepted (and cached) if allow_empty is set for the lookup.
+        """
+        cache_key = self.get_cache_key(lookup)
+        cache_file = get_cache_file(self.cache_dir, lookup["name"])
+        items = get_reference(cache_key, self.ttl, cache_file)
+        if items is not None:
+            log.info(f"Using cached reference dataset '{lookup['name']}' with {len(items)} items")
+            return items
+
+        from scripts.classes.ETLExtract import ETLExtractFactory
+        extractor = ETLExtractFactory.create_extractor(lookup.get("source", {}))
+        log.info(f"Created extractor for reference dataset '{lookup['name']}': {extractor}")
+        if not extractor.setup():
+            raise RuntimeError(f"Extractor setup failed for reference dataset '{lookup['name']}'")
+        data = extractor.extract()
+        if "items" not in data:
+            raise RuntimeError(f"Extraction failed for reference dataset '{lookup['name']}'")
+        items = data["items"]
+        if not items and not lookup.get("allow_empty", False):
+            raise RuntimeError(f"Reference dataset '{lookup['name']}' is empty, set allow_empty if this is expected")
+        log.info(f"Extracted reference dataset '{lookup['name']}' with {len(items)} items")
+        store_reference(cache_key, items, self.max_entries, cache_file)
+        return items
+
+    def build_index(self, lookup: dict) -> dict:
+        """
+        Builds the hash index of the reference dataset of a lookup: reference key -> list of the fields to add.
+        """
+        _, reference_key = self.get_key_fields(lookup)
+        fields = lookup.get("fields")
+        prefix = lookup.get("prefix", "")
+        index: dict = {}
+        for reference_item in self.load_reference(lookup):
+            key = tuple(map(reference_item.get, reference_key))
+            # As in a SQL join, empty keys never match
+            if None in key:
+                continue
+            if isinstance(fields, dict):
+                values = {target: reference_item.get(field) for field, target in fields.items()}
+            elif fields:
+                values = {f"{prefix}{field}": reference_item.get(field) for field in fields}
+            else:
+                values = {f"{prefix}{field}": value for field, value in reference_item.items() if field not in reference_key}
+            index.setdefault(key, []).append(values)
+        log.debug(f"Indexed reference dataset '{lookup['name']}': {len(index)} keys")
+        return index
+
+    def get_empty_values(self, lookup: dict, index: dict) -> dict:
+        """
+        Returns the fields set to None on items without a match in a left join.
+        """
+        fields = lookup.get("fields")
+        prefix = lookup.get("prefix", "")
+        if isinstance(fields, dict):
+            return dict.fromkeys(fields.values())
+        if fields:
+            return dict.fromkeys(f"{prefix}{field}" for field in fields)
+        first_values = next(iter(index.values()), [{}])
+        return dict.fromkeys(first_values[0])
+
+    def apply_lookup(self, lookup: dict, items: list) -> tuple[list, int]:
+        """
+        Enriches or joins a batch of items with the reference dataset of a lookup.
+
+        Returns:
+            Tuple of (transformed items, number of items without match)
+        """
+        index: dict = self.indexes[lookup["name"]]
+        key, _ = self.get_key_fields(lookup)
+        inner = lookup.get("join", "left") == "inner"
+        match_all = lookup.get("match", "first") == "all"
+        empty_values = self.get_empty_values(lookup, index)
+        out: list = []
+        unmatched = 0
+        for item in items:
+            matches = index.get(tuple(map(item.get, key)))
+            if matches is None:
+                unmatched += 1
+                if not inner:
+                    item.update(empty_values)
+                    out.append(item)
+            elif match_all and len(matches) > 1:
+                for values in matches:
+                    out.append({**item, **values})
+            else:
+                item.update(matches[0])
+                out.append(item)
+        return out, unmatched
+
+    def transform_batches(self, batches):
+        """
+        Transform a stream of batches with all lookups.
+
+        Args:
+            batches: Iterable of lists of item dictionaries.
+
+        Returns:
+            Generator of lists of transformed item dictionaries.
+        """
+        for lookup in self.lookups:
+            if lookup["name"] not in self.indexes:
+                self.indexes[lookup["name"]] = self.build_index(lookup)
+        unmatched: dict = dict.fromkeys((lookup["name"] for lookup in self.lookups), 0)
+        items_in, items_out = 0, 0
+        for batch in batches:
+            items_in += len(batch)
+            items = batch
+            for lookup in self.lookups:
+                items, count = self.apply_lookup(lookup, items)
+                unmatched[lookup["name"]] += count
+            items_out += len(items)
+            if items:
+                yield items
+        for name, count in unmatched.items():
+            log.info(f"Lookup '{name}': {count} items without match")
+        log.info(f"Data transformed using {len(self.lookups)} lookups: {items_in} items in, {items_out} items out")
+
+    def transform(self, data: dict) -> dict:
+        """
+        Transform data with all lookups.
+
+        Args:
+            data (dict): Dictionary of data items to be transformed.
+
+        Returns:
+            dict: Transformed data items.
+        """
+        try:
+            transformed_data = {"items": [item for batch in self.transform_batches([data.get("items", [])]) for item in batch]}
+            if self.debug:
+                self.save_debug_data(transformed_data)
+            return transformed_data
+        except Exception as e:
+            log.error(f"Error executing lookups of {self.name}: {e}")
+            return data  # Return original data in case of error
+
+    def setup(self) -> bool:
+        """
+        Setup method for ETLTransformLookup.
+        Checks the lookups and loads and indexes their reference datasets.
+        Returns:
+            bool: True if setup is successful, False otherwise.
+        """
+        if not self.lookups:
+            log.error("No lookups specified in configuration.")
+            return False
+
+        for lookup in self.lookups:
+            if not lookup.get("name") or not lookup.get("key") or not lookup.get("source"):
+                log.error(f"Lookup needs a name, a key and a source: {lookup}")
+                return False
+            if lookup.get("join", "left") not in JOIN_TYPES:
+                log.error(f"Unsupported join type '{lookup.get('join')}' of lookup '{lookup['name']}', use one of {JOIN_TYPES}")
+                return False
+            if lookup.get("match", "first") not in MATCH_TYPES:
+                log.error(f"Unsupported match type '{lookup.get('match')}' of lookup '{lookup['name']}', use one of {MATCH_TYPES}")
+                return False
+
+        try:
+            for lookup in self.lookups:
+                self.indexes[lookup["name"]] = self.build_index(lookup)
+        except Exception as e:
+            log.error(f"Error loading reference datasets: {e}")
+            return False
+
+        log.info("ETLTransformLookup setup completed successfully.")
+        return True
@@ -0,0 +1,391 @@
+###################################################################################################
+# ETLTransformOperators to transform data with configured built-in operators                      #
+###################################################################################################
+import decimal
+import heapq
+import logging
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+
+from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
+from scripts.utils.converters import get_coercer
+
+
+########################################################################################################################
+#                                                          Setup                                                       #
+########################################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Supported operators, dedupe is the only one which needs more than one item
+OPERATORS: list = ["set", "replace", "filter", "rename", "cast", "dedupe"]
+
+# Filter conditions as Python expressions over the field value v and the configured value c
+CONDITIONS: dict = {
+    "equals": "v == {c}",
+    "not_equals": "v != {c}",
+    "in": "v in {c}",
+    "not_in": "v not in {c}",
+    "startswith": "isinstance(v, str) and v.startswith({c})",
+    "endswith": "isinstance(v, str) and v.endswith({c})",
+    "contains": "isinstance(v, str) and {c} in v",
+    "not_empty": "v is not None and v != ''",
+}
+
+
+########################################################################################################################
+#                                                      Deduplicator                                                    #
+########################################################################################################################
+class Deduplicator:
+    """
+    Keeps one item per key over all batches: the item with the greatest order_by value (the latest one),
+    or the first item if no order_by field is configured. Items are returned in the order their key was first seen.
+
+    If max_items is set, the kept items are spilled to a run file sorted by key whenever more than max_items
+    keys are held in memory. At the end the runs are merged by key and the result is sorted back into
+    first-seen order with a second external sort, so memory stays bounded by max_items items.
+    """
+
+    def __init__(self, key: list, order_by: str = "", max_items: int = 0, spill_dir: str = ""):
+        self.key = key
+        self.order_by = order_by
+        self.max_items = max_items
+        self.spill_dir = spill_dir or None
+        self.items: dict = {}
+        self.runs: list = []
+
+    def add(self, items: list):
+        kept = self.items
+        fields = self.key
+        order_by = self.order_by
+        for item in items:
+            key = tuple(map(item.get, fields))
+            existing_item = kept.get(key)
+            if existing_item is None:
+                kept[key] = item
+                if self.max_items and len(kept) > self.max_items:
+                    self.spill()
+                    kept = self.items
+            elif order_by and item.get(order_by, "") > existing_item.get(order_by, ""):
+                kept[key] = item
+
+    @staticmethod
+    def get_sort_key(key: tuple) -> tuple:
+        """
+        Returns a sortable version of a key: values are grouped by type, so keys with mixed types
+        (e.g. None and strings) can be sorted. Numbers form one group, as 1 and 1.0 are the same key.
+        """
+        return tuple(("number" if isinstance(value, (int, float, decimal.Decimal)) else type(value).__name__, value) for value in key)
+
+    def write_run(self, records) -> str:
+        """
+        Writes records to a new run file and returns its path.
+        """
+        handle, path = tempfile.mkstemp(prefix="etlit_dedupe_", suffix=".run", dir=self.spill_dir)
+        with os.fdopen(handle, "wb") as f:
+            for record in records:
+                pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @staticmethod
+    def read_run(path: str):
+        """
+        Yields the records of a run file.
+        """
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    @staticmethod
+    def remove_runs(paths: list):
+        """
+        Removes run files.
+        """
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning(f"Could not remove run file {path}: {e}")
+
+    def spill(self):
+        """
+        Spills the kept items to a run of (sort key, run number, position, item) records sorted by key.
+        Run number and position of a key give its first-seen order over all runs.
+        """
+        run = len(self.runs)
+        records = sorted(((self.get_sort_key(key), run, position, item) for position, (key, item) in enumerate(self.items.items())),
+                         key=lambda record: record[0])
+        self.items = {}
+        self.runs.append(self.write_run(records))
+        log.debug(f"Spilled {len(records)} deduplicated items to run {run}")
+
+    def merge_runs(self, paths: list):
+        """
+        Merges runs by key and yields the kept item per key as (run number, position, item),
+        where run number and position are those of the first occurrence of the key.
+        """
+        current = None
+        # Equal keys come in run order, so with equal order_by values the earlier item is kept as in add()
+        for record in heapq.merge(*[self.read_run(path) for path in paths], key=itemgetter(0, 1)):
+            if current is not None and record[0] == current[0]:
+                if self.order_by and record[3].get(self.order_by, "") > current[3].get(self.order_by, ""):
+                    current = (current[0], current[1], current[2], record[3])
+                continue
+            if current is not None:
+                yield current[1:]
+            current = record
+        if current is not None:
+            yield current[1:]
+
+    def result(self, batch_size: int = 10000):
+        """
+        Yields the kept items in lists of up to batch_size items and resets the Deduplicator.
+        """
+        if not self.runs:
+            items = list(self.items.values())
+            self.items = {}
+            for start in range(0, len(items), batch_size):
+                yield items[start:start + batch_size]
+            return
+
+        if self.items:
+            self.spill()
+        runs, self.runs = self.runs, []
+        ordered_runs: list = []
+        first_seen = itemgetter(0, 1)
+        try:
+            # Sort the merged items back into first-seen order with runs of at most max_items items
+            records: list = []
+            for record in self.merge_runs(runs):
+                records.append(record)
+                if len(records) >= self.max_items:
+                    records.sort(key=first_seen)
+                    ordered_runs.append(self.write_run(records))
+                    records = []
+            records.sort(key=first_seen)
+            log.info(f"Merged {len(runs)} spilled runs of deduplicated items")
+
+            batch: list = []
+            for record in heapq.merge(*[self.read_run(path) for path in ordered_runs], records, key=first_seen):
+                batch.append(record[2])
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            self.remove_runs(runs + ordered_runs)
+
+
+########################################################################################################################
+#                                                  ETLTransformOperators                                               #
+########################################################################################################################
+class ETLTransformOperators(ETLTransformBase):
+    """
+    ETL Transform class to transform data with configured operators instead of a hook file.
+    All row operators between two dedupe operators are compiled into a single function,
+    so every batch is traversed only once for all of them.
+    Inherits from ETLTransformBase.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize ETLTransformOperators with configuration.
+
+        Args:
+            config (dict): Configuration dictionary for the transform.
+        """
+        super().__init__(config)
+        self.name = config.get("name", "ETLTransformOperators")
+        self.operations: list = config.get("operations", [])
+        self.debug = config.get("debug", False)
+        self.stages: list = []
+        self.cast_errors: dict = {}
+
+        log.info(f"Initialized ETLTransformOperators with {len(self.operations)} operations")
+
+    def is_row_local(self) -> bool:
+        """
+        Returns True if all operations transform every item independently of all other items.
+        """
+        return all(operation.get("op") != "dedupe" for operation in self.operations)
+
+    def compile_row_operations(self, operations: list):
+        """
+        Compiles a list of row operators (set, replace, filter, rename, cast) into one Python function
+        transforming a list of items in a single pass. Configured values and field names are passed
+        to the function as constants, they are never part of the generated source.
+
+        Returns:
+            Function taking a list of items and returning the list of transformed items.
+        """
+        constants: dict = {}
+        lines: list = []
+
+        def constant(value) -> str:
+            name = f"c{len(constants)}"
+            constants[name] = value
+            return name
+
+        for operation in operations:
+            op = operation.get("op")
+            if op == "set":
+                lines.append(f"item[{constant(operation['field'])}] = {constant(operation.get('value'))}")
+            elif op == "replace":
+                old, new = constant(operation["old"]), constant(operation.get("new", ""))
+                fields = operation.get("fields")
+                if fields:
+                    for field in fields:
+                        field = constant(field)
+                        lines.append(f"v = item.get({field})")
+                        lines.append(f"if isinstance(v, str) and {old} in v: item[{field}] = v.replace({old}, {new})")
+                else:
+                    lines.append("for k, v in item.items():")
+                    lines.append(f"    if isinstance(v, str) and {old} in v: item[k] = v.replace({old}, {new})")
+            elif op == "filter":
+                condition = operation.get("condition", "equals")
+                if condition not in CONDITIONS:
+                    raise ValueError(f"Unsupported filter condition '{condition}', use one of {list(CONDITIONS)}")
+                value = operation.get("value")
+                if condition in ("in", "not_in"):
+                    value = frozenset(value)
+                elif condition in ("startswith", "endswith") and isinstance(value, list):
+                    value = tuple(value)
+                expression = CONDITIONS[condition].format(c=constant(value))
+                lines.append(f"v = item.get({constant(operation['field'])}, '')")
+                # Items matching the condition are kept, with exclude they are removed
+                if operation.get("exclude", False):
+                    lines.append(f"if {expression}: continue")
+                else:
+                    lines.append(f"if not ({expression}): continue")
+            elif op == "rename":
+                for old, new in operation["fields"].items():
+                    old, new = constant(old), constant(new)
+                    lines.append(f"if {old} in item: item[{new}] = item.pop({old})")
+            elif op == "cast":
+                for field, type_name in operation["fields"].items():
+                    coerce = constant(get_coercer(type_name, operation.get("options")))
+                    field = constant(field)
+                    lines.append(f"v = item.get({field})")
+                    lines.append("if v is not None:")
+                    lines.append(f"    try: item[{field}] = {coerce}(v)")
+                    lines.append("    except (ValueError, TypeError, ArithmeticError):")
+                    lines.append(f"        item[{field}] = None")
+                    lines.append(f"        errors[{field}] = errors.get({field}, 0) + 1")
+            else:
+                raise ValueError(f"Unsupported operator '{op}', use one of {OPERATORS}")
+
+        body = "\n".join(f"        {line}" for line in lines)
+        source = f"def transform_rows(items):\n    out = []\n    append = out.append\n    for item in items:\n{body}\n        append(item)\n    return out\n"
+        log.debug(f"Compiled row operations:\n{source}")
+        namespace = {"errors": self.cast_errors, **constants}
+        exec(compile(source, f"<{self.name} operations>", "exec"), namespace)
+        return namespace["transform_rows"]
+
+    def compile(self):
+        """
+        Compiles the operations into stages: functions for runs of row operators and Deduplicators between them.
+        """
+        stages: list = []
+        row_operations: list = []
+        for operation in self.operations:
+            if operation.get("op") == "dedupe":
+                if row_operations:
+                    stages.append(self.compile_row_operations(row_operations))
+                    row_operations = []
+                key = operation.get("key", [])
+                stages.append(Deduplicator(key if isinstance(key, list) else [key], operation.get("order_by", ""),
+                                           operation.get("max_items_in_memory", 0), operation.get("spill_dir", "")))
+            else:
+                row_operations.append(operation)
+        if row_operations:
+            stages.append(self.compile_row_operations(row_operations))
+        self.stages = stages
+
+    def run_stages(self, items: list, start: int = 0) -> list:
+        """
+        Runs items through the stages beginning at start, until a Deduplicator takes them.
+        """
+        for stage in self.stages[start:]:
+            if isinstance(stage, Deduplicator):
+                stage.add(items)
+                return []
+            items = stage(items)
+        return items
+
+    def transform_batches(self, batches):
+        """
+        Transform a stream of batches with the compiled operations.
+        Without dedupe every batch is transformed and yielded on its own,
+        items held by a dedupe are emitted after the last batch.
+
+        Args:
+            batches: Iterable of lists of item dictionaries.
+
+        Returns:
+            Generator of lists of transformed item dictionaries.
+        """
+        if not self.stages:
+            self.compile()
+        self.cast_errors.clear()
+        items_in, items_out = 0, 0
+        for batch in batches:
+            items_in += len(batch)
+            items = self.run_stages(batch)
+            items_out += len(items)
+            if items:
+                yield items
+        for index, stage in enumerate(self.stages):
+            if isinstance(stage, Deduplicator):
+                for items in stage.result():
+                    items = self.run_stages(items, index + 1)
+                    items_out += len(items)
+                    if items:
+                        yield items
+        for field, count in self.cast_errors.items():
+            log.warning(f"Could not cast {count} values of field '{field}', set to None")
+        log.info(f"Data transformed using {len(self.operations)} operations: {items_in} items in, {items_out} items out")
+
+    def transform(self, data: dict) -> dict:
+        """
+        Transform data with the compiled operations.
+
+        Args:
+            data (dict): Dictionary of data items to be transformed.
+
+        Returns:
+            dict: Transformed data items.
+        """
+        try:
+            transformed_data = {"items": [item for batch in self.transform_batches([data.get("items", [])]) for item in batch]}
+            if self.debug:
+                self.save_debug_data(transformed_data)
+            return transformed_data
+        except Exception as e:
+            log.error(f"Error executing operations of {self.name}: {e}")
+            return data  # Return original data in case of error
+
+    def setup(self) -> bool:
+        """
+        Setup method for ETLTransformOperators.
+        Checks and compiles the configured operations.
+        Returns:
+            bool: True if setup is successful, False otherwise.
+        """
+        if not self.operations:
+            log.error("No operations specified in configuration.")
+            return False
+
+        try:
+            self.compile()
+        except (KeyError, ValueError, TypeError) as e:
+            log.error(f"Invalid operations configuration: {e}")
+            return False
+
+        log.info("ETLTransformOperators setup completed successfully.")
+        return True
@@ -4,16 +4,27 @@
 import json
 from scripts.classes.ETLLoad.ETLLoadBase import ETLLoadBase
 from scripts.classes.ETLTransform.ETLTransformBase import ETLTransformBase
+from scripts.classes.ETLTransform.ETLTransformChain import ETLTransformChain
 from scripts.classes.ETLTransform.ETLTransformHookFunction import ETLTransformHookFunction
+from scripts.classes.ETLTransform.ETLTransformLookup import ETLTransformLookup
+from scripts.classes.ETLTransform.ETLTransformOperators import ETLTransformOperators
 
 class ETLTransformFactory:
     """
     Factory class to create ETLTransform instances based on configuration.
     """
     @staticmethod
-    def create_transformer(config: dict) -> ETLTransformBase:
+    def create_transformer(config: dict | list) -> ETLTransformBase:
+        # A list of transformations is executed as a chain
+        if isinstance(config, list):
+            steps = ETLTransformChain.fuse_configs(config)
+            return ETLTransformChain(config, [ETLTransformFactory.create_transformer(step) for step in steps])
         transform_type = config.get("type")
         if transform_type == "hookfunction":
             return ETLTransformHookFunction(config)
+        elif transform_type == "operators":
+            return ETLTransformOperators(config)
+        elif transform_type == "lookup":
+            return ETLTransformLookup(config)
         else:
             raise ValueError(f"Unknown ETLTransform type: {transform_type}")
@@ -36,4 +36,52 @@ def transform_items(data, config) -> dict:
         if existing_item is None or item.get("systemModifiedAt", "") > existing_item.get("systemModifiedAt", ""):
             filtered_items[key] = item
 
-    return {"items": list(filtered_items.values())}
\ No newline at end of file
+    return {"items": list(filtered_items.values())}
+
+
+# Latest item per ("no", "dmsNo") seen by the batch hook of the running process.
+# The hook module is loaded once per run and shared by all processes, so init starts with a fresh dict
+latest_items: dict = {}
+
+
+def init(config):
+    """
+    Called once before the first batch of the batch hook.
+    Drops the items left over by a previous process of the run (e.g. one which failed before finalize).
+    """
+    global latest_items
+    latest_items = {}
+
+
+def transform_batch(items, config) -> list:
+    """
+    Batch version of transform_items (mode "batch"): called for every batch, changes the items in place.
+    Keeps only the latest modified item per ("no", "dmsNo") over all batches, the items are emitted by finalize.
+    
+    Args:
+        items (list): Items of the batch
+        
+        config (dict): Configuration dictionary for transformation rules.
+        
+    Returns:
+        list: Nothing yet, all items are emitted by finalize
+    """
+    for item in items:
+        # Example transformation: Add company code in a new field
+        item["company"] = "Raiff. Delbrück"
+
+        key = (item.get("no"), item.get("dmsNo"))
+        existing_item = latest_items.get(key)
+        if existing_item is None or item.get("systemModifiedAt", "") > existing_item.get("systemModifiedAt", ""):
+            latest_items[key] = item
+    return []
+
+
+def finalize() -> list:
+    """
+    Called once after the last batch, returns the deduplicated items.
+    """
+    global latest_items
+    items = list(latest_items.values())
+    latest_items = {}
+    return items
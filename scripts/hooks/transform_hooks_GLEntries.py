@@ -36,4 +36,32 @@ def transform_items(data, config) -> dict:
     # remove all lines where the documentNumber starts not with ER*
     transformed_items = [item for item in transformed_items if item.get("documentNumber", "").startswith("ER")]
 
-    return {"items": list(transformed_items)}
\ No newline at end of file
+    return {"items": list(transformed_items)}
+
+
+def transform_batch(items, config):
+    """
+    Batch version of transform_items (mode "batch"): a generator which changes the items of a batch in place.
+    
+    Args:
+        items (list): Items of the batch
+        
+        config (dict): Configuration dictionary for transformation rules.
+        
+    Yields:
+        dict: Transformed items
+    """
+    for item in items:
+        # Example transformation: Add company code in a new field
+        item["company"] = "Leder Brinkmann GmbH"
+
+        # Check each item field for "'" and replace with ""
+        for key, value in item.items():
+            if isinstance(value, str):
+                item[key] = value.replace("'", "")
+
+        # remove all lines where the documentNumber starts not with ER*
+        if not item.get("documentNumber", "").startswith("ER"):
+            continue
+
+        yield item
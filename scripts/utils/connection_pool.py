@@ -0,0 +1,223 @@
+###################################################################################################
+# Shared ODBC connection pool for all MSSQL extractors and loaders of a run                       #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import logging
+import threading
+import time
+
+import pyodbc
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Maximum number of open connections per server if not configured otherwise
+DEFAULT_MAX_CONNECTIONS: int = 10
+
+# Seconds to wait for a free connection slot on a server
+DEFAULT_ACQUIRE_TIMEOUT: int = 600
+
+# Pools per connection string and connection slots per server, shared by the whole run
+POOLS: dict = {}
+SERVERS: dict = {}
+REGISTRY_LOCK = threading.Lock()
+
+
+####################################################################################################
+#                                          ServerSlots                                             #
+####################################################################################################
+class ServerSlots:
+    """
+    Open connections of all pools of one server. The condition guards the counter and the idle
+    connections of all pools of the server; waiters are notified whenever a connection is
+    returned or closed.
+    """
+
+    def __init__(self, server: str, max_connections: int):
+        self.server = server
+        self.max_connections = max_connections
+        self.open = 0
+        self.condition = threading.Condition()
+
+
+####################################################################################################
+#                                          ConnectionPool                                          #
+####################################################################################################
+class ConnectionPool:
+    """
+    Pool of pyodbc connections for one connection string.
+    Idle connections are health checked on checkout. The number of open connections is limited
+    per server (over all pools of the server).
+    """
+
+    def __init__(self, connection_string: str, server: str):
+        self.connection_string = connection_string
+        self.server = server
+        self.idle: list = []
+        self.slots: ServerSlots = SERVERS[server]
+        self.max_connections = self.slots.max_connections
+
+    def __str__(self):
+        return f"ConnectionPool({self.server}, {len(self.idle)} idle, max {self.max_connections})"
+
+    def acquire(self, timeout: int = DEFAULT_ACQUIRE_TIMEOUT):
+        """
+        Check out a connection: a healthy idle one if available, otherwise a new one
+        as soon as the server has a free connection slot. Waits until a connection is
+        returned or closed if neither is possible.
+
+        :return: pyodbc Connection object
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            connection, evicted = None, None
+            with self.slots.condition:
+                while True:
+                    if self.idle:
+                        connection = self.idle.pop()
+                        break
+                    if self.slots.open < self.max_connections:
+                        self.slots.open += 1
+                        break
+                    # Take over the slot of an idle connection of another database on the same server
+                    evicted = self.take_idle_connection_of_other_pool()
+                    if evicted is not None:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No free connection to {self.server} within {timeout} seconds (max {self.max_connections})")
+                    self.slots.condition.wait(remaining)
+
+            if connection is not None:
+                if self.is_healthy(connection):
+                    log.debug(f"Reusing pooled connection to {self.server}")
+                    return connection
+                log.info(f"Discarding broken pooled connection to {self.server}")
+                self.discard(connection)
+                continue
+
+            if evicted is not None:
+                self.close_quietly(evicted)
+            try:
+                connection = pyodbc.connect(self.connection_string)
+            except Exception:
+                self.free_slot()
+                raise
+            log.info(f"Opened new pooled connection to {self.server}")
+            return connection
+
+    def release(self, connection):
+        """
+        Return a connection to the pool and wake a waiting thread. Open transactions are rolled back.
+        """
+        try:
+            connection.rollback()
+        except Exception as e:
+            log.info(f"Discarding pooled connection to {self.server} on release: {e}")
+            self.discard(connection)
+            return
+        with self.slots.condition:
+            self.idle.append(connection)
+            self.slots.condition.notify_all()
+
+    def discard(self, connection):
+        """
+        Close a connection and free its server slot.
+        """
+        self.close_quietly(connection)
+        self.free_slot()
+
+    def free_slot(self):
+        """
+        Free a server slot and wake a waiting thread.
+        """
+        with self.slots.condition:
+            self.slots.open -= 1
+            self.slots.condition.notify_all()
+
+    def take_idle_connection_of_other_pool(self):
+        """
+        Remove an idle connection of another pool of the server, whose slot is taken over by the caller.
+        Must be called with the condition of the server held.
+        """
+        with REGISTRY_LOCK:
+            pools = [pool for pool in POOLS.values() if pool.server == self.server and pool is not self]
+        for pool in pools:
+            if pool.idle:
+                return pool.idle.pop()
+        return None
+
+    def evict_one(self) -> bool:
+        """
+        Close one idle connection, returns False if there is none.
+        """
+        with self.slots.condition:
+            connection = self.idle.pop() if self.idle else None
+        if connection is None:
+            return False
+        self.discard(connection)
+        return True
+
+    def close_all(self):
+        """
+        Close all idle connections.
+        """
+        while self.evict_one():
+            pass
+
+    @staticmethod
+    def close_quietly(connection):
+        """
+        Close a connection, ignoring errors of broken connections.
+        """
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def is_healthy(connection) -> bool:
+        """
+        Check a connection with a trivial query.
+        """
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1").fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def get_pool(connection_string: str, server: str, max_connections: int = None) -> ConnectionPool:
+    """
+    Returns the shared pool for the connection string. The first configured max_connections of a server wins.
+    """
+    with REGISTRY_LOCK:
+        if server not in SERVERS:
+            limit = max_connections or DEFAULT_MAX_CONNECTIONS
+            SERVERS[server] = ServerSlots(server, limit)
+            log.info(f"Limiting connections to {server} to {limit}")
+        if connection_string not in POOLS:
+            POOLS[connection_string] = ConnectionPool(connection_string, server)
+        return POOLS[connection_string]
+
+
+def close_all_pools():
+    """
+    Close all idle connections of all pools, e.g. at the end of a run.
+    """
+    with REGISTRY_LOCK:
+        pools = list(POOLS.values())
+    for pool in pools:
+        pool.close_all()
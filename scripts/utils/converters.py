@@ -0,0 +1,198 @@
+###################################################################################################
+# Column-wise type conversion and type inference for extracted data                               #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import datetime
+import decimal
+import logging
+import re
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+TRUE_VALUES: set = {"true", "1", "yes", "y", "ja", "j", "x"}
+FALSE_VALUES: set = {"false", "0", "no", "n", "nein"}
+
+# Order in which types are tried during inference, the first type matching all samples wins
+INFERENCE_ORDER: list = ["int", "decimal", "date", "datetime", "bool"]
+
+# Values like "00123" (ZIP codes, document numbers) must not be inferred as numbers,
+# dates like "01.02.2025" are still recognized
+LEADING_ZERO = re.compile(r"^[+-]?0\d")
+NUMERIC_TYPES: set = {"int", "decimal"}
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def get_converter(type_name: str, options: dict = None):
+    """
+    Returns a function converting a single non-empty string value into the given type.
+
+    Supported types: string, int, decimal, float, date, datetime, bool
+    Options:
+     - decimal_separator: Decimal separator of numbers (Default: ".")
+     - date_format: strptime format for dates (Default: ISO 8601)
+     - datetime_format: strptime format for datetimes (Default: ISO 8601)
+    """
+    options = options or {}
+    decimal_separator: str = options.get("decimal_separator", ".")
+    date_format: str = options.get("date_format", "")
+    datetime_format: str = options.get("datetime_format", "")
+
+    def normalize_number(value: str) -> str:
+        if decimal_separator != ".":
+            return value.replace(".", "").replace(decimal_separator, ".")
+        return value
+
+    def to_bool(value: str) -> bool:
+        lowered = value.strip().lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValueError(f"invalid literal for bool: '{value}'")
+
+    def to_decimal(value: str) -> decimal.Decimal:
+        try:
+            return decimal.Decimal(normalize_number(value))
+        except decimal.InvalidOperation:
+            raise ValueError(f"invalid literal for Decimal: '{value}'")
+
+    type_name = (type_name or "string").lower()
+    if type_name in ("string", "str"):
+        return str
+    if type_name in ("int", "integer"):
+        return int
+    if type_name == "decimal":
+        return to_decimal
+    if type_name in ("float", "double"):
+        return lambda value: float(normalize_number(value))
+    if type_name == "date":
+        if date_format:
+            return lambda value: datetime.datetime.strptime(value, date_format).date()
+        return datetime.date.fromisoformat
+    if type_name == "datetime":
+        if datetime_format:
+            return lambda value: datetime.datetime.strptime(value, datetime_format)
+        return datetime.datetime.fromisoformat
+    if type_name in ("bool", "boolean"):
+        return to_bool
+    raise ValueError(f"Unsupported data type: {type_name}")
+
+
+def convert_column(values: list, type_name: str, options: dict = None) -> tuple[list, list]:
+    """
+    Converts a whole column of string values into the given type in one pass.
+    Empty values become None. Values which can not be converted become None as well
+    and are collected instead of raising.
+
+    Returns:
+        Tuple of (converted values, list of (index, value, error) tuples)
+    """
+    converter = get_converter(type_name, options)
+    if converter is str:
+        return list(values), []
+
+    # Fast path: the whole column converts without a single error
+    try:
+        return [converter(value) if value != "" and value is not None else None for value in values], []
+    except (ValueError, TypeError, ArithmeticError):
+        pass
+
+    converted: list = []
+    errors: list = []
+    for index, value in enumerate(values):
+        if value == "" or value is None:
+            converted.append(None)
+            continue
+        try:
+            converted.append(converter(value))
+        except (ValueError, TypeError, ArithmeticError) as e:
+            converted.append(None)
+            errors.append((index, value, str(e)))
+    return converted, errors
+
+
+def infer_type(values: list, options: dict = None) -> str:
+    """
+    Infers the type of a column from a sample of its string values.
+    Falls back to "string" if no other type matches all non-empty samples.
+    """
+    samples = [value for value in values if value != "" and value is not None]
+    if not samples:
+        return "string"
+    leading_zero = any(LEADING_ZERO.match(value) for value in samples)
+    for type_name in INFERENCE_ORDER:
+        if leading_zero and type_name in NUMERIC_TYPES:
+            continue
+        converter = get_converter(type_name, options)
+        try:
+            for value in samples:
+                converter(value)
+        except (ValueError, TypeError, ArithmeticError):
+            continue
+        if type_name == "bool" and not all(value.strip().lower() in ("true", "false") for value in samples):
+            continue
+        return type_name
+    return "string"
+
+
+def get_coercer(type_name: str, options: dict = None):
+    """
+    Returns a function coercing a value of any type (not only strings) into the given type.
+    Values which already have the target type are passed through unchanged, None stays None.
+    Timezone aware datetimes are converted to naive UTC datetimes.
+    """
+    type_name = (type_name or "string").lower()
+    converter = get_converter(type_name, options)
+
+    def coerce(value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            if value == "":
+                return None if type_name not in ("string", "str") else value
+            if type_name == "datetime":
+                # Parse only, the timezone is handled below
+                value = converter(value.replace("Z", "+00:00") if value.endswith("Z") else value)
+            elif type_name == "date" and "T" in value:
+                return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+            else:
+                return converter(value)
+        if type_name in ("string", "str"):
+            return value if isinstance(value, str) else str(value)
+        if type_name in ("int", "integer"):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            return int(value)
+        if type_name == "decimal":
+            if isinstance(value, decimal.Decimal):
+                return value
+            return decimal.Decimal(str(value))
+        if type_name in ("float", "double"):
+            return value if isinstance(value, float) else float(value)
+        if type_name in ("bool", "boolean"):
+            return bool(value)
+        if type_name == "date":
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+        if type_name == "datetime":
+            if isinstance(value, datetime.datetime):
+                if value.tzinfo is not None:
+                    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                return value
+            if isinstance(value, datetime.date):
+                return datetime.datetime(value.year, value.month, value.day)
+        raise TypeError(f"can not convert {type(value).__name__} to {type_name}")
+
+    return coerce
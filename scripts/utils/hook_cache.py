@@ -0,0 +1,86 @@
+###################################################################################################
+# Cache of compiled and executed transform hook modules shared by all processes of a run          #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import hashlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Loaded hook modules per absolute path as {"mtime": ns, "size": bytes, "hash": hex, "module": module}
+MODULES: dict = {}
+MODULES_LOCK = threading.Lock()
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def compute_source_hash(hook_file: str) -> str:
+    """
+    Computes the sha1 hash of the hook source file.
+    """
+    with open(hook_file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def get_module_name(hook_file: str, source_hash: str) -> str:
+    """
+    Returns a unique module name for a version of a hook file, e.g. etlit_hook_transform_hooks_LB_1a2b3c4d5e6f.
+    """
+    name = os.path.splitext(os.path.basename(hook_file))[0]
+    return f"etlit_hook_{name}_{source_hash[:12]}"
+
+
+def load_hook_module(hook_file: str):
+    """
+    Returns the module of a hook file. The file is compiled and executed only once per run,
+    so module level setup (lookup tables, compiled regexes) of the hook runs only once.
+    The module is reloaded when the content of the file changed: a changed mtime or size
+    only triggers a hash comparison, the module is reused if the content is the same.
+    """
+    path = os.path.abspath(hook_file)
+    stat = os.stat(path)
+    with MODULES_LOCK:
+        entry: dict = MODULES.get(path)
+        if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["module"]
+
+        source_hash = compute_source_hash(path)
+        if entry and entry["hash"] == source_hash:
+            entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            return entry["module"]
+
+        module_name = get_module_name(path, source_hash)
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        # Registered so objects defined in the hook can be pickled by reference
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            del sys.modules[module_name]
+            raise
+        if entry:
+            sys.modules.pop(entry["module"].__name__, None)
+        MODULES[path] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": source_hash, "module": module}
+        log.info(f"Loaded hook module {hook_file} as {module_name}")
+        return module
+
+
+def get_hook_function(hook_file: str, function_name: str):
+    """
+    Returns a function of a (cached) hook module, None if the module has no such function.
+    """
+    return getattr(load_hook_module(hook_file), function_name, None)
@@ -0,0 +1,137 @@
+###################################################################################################
+# Persistent manifest of already ingested input files                                             #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Files are hashed in chunks so large inputs never have to be held in memory
+HASH_CHUNK_SIZE: int = 1024 * 1024
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def compute_file_hash(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    Computes the blake2b content hash of a file incrementally, chunk by chunk.
+    """
+    file_hash = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+####################################################################################################
+#                                          FileManifest                                            #
+####################################################################################################
+class FileManifest:
+    """
+    Index of input files which were already ingested by a process.
+    Each entry records path, size, mtime and content hash of the file.
+    The index is stored as a JSON file and written atomically.
+    """
+
+    def __init__(self, manifest_file: str):
+        self.manifest_file = manifest_file
+        self.entries: dict = {}
+        self.hashes: set = set()
+        self.load()
+
+    def __str__(self):
+        return f"FileManifest({self.manifest_file}, {len(self.entries)} entries)"
+
+    def load(self):
+        """
+        Loads the manifest from disk. A missing manifest file is treated as empty.
+        """
+        if not os.path.isfile(self.manifest_file):
+            log.debug(f"Manifest file {self.manifest_file} does not exist yet.")
+            return
+        with open(self.manifest_file, "r", encoding="utf-8") as f:
+            self.entries = json.load(f).get("files", {})
+        self.hashes = {entry.get("hash") for entry in self.entries.values()}
+        log.debug(f"Loaded {self}")
+
+    def save(self):
+        """
+        Writes the manifest to a temp file and renames it over the old manifest.
+        """
+        directory = os.path.dirname(self.manifest_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{self.manifest_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, indent=4)
+        os.replace(temp_file, self.manifest_file)
+        log.debug(f"Saved {self}")
+
+    def lookup(self, file_path: str) -> tuple[bool, dict]:
+        """
+        Checks whether a file was already ingested.
+        If path, size and mtime match a recorded entry, the file is not hashed at all.
+        Otherwise the content hash is computed and compared against all recorded hashes,
+        so renamed or copied files with known content are detected as well.
+
+        Returns:
+            Tuple of (already ingested, entry describing the file in its current state)
+        """
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        entry: dict = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+        known_entry = self.entries.get(path)
+        if known_entry and known_entry.get("size") == entry["size"] and known_entry.get("mtime") == entry["mtime"]:
+            return True, known_entry
+
+        entry["hash"] = compute_file_hash(file_path)
+        return entry["hash"] in self.hashes, entry
+
+    def record(self, entry: dict):
+        """
+        Records an ingested file (as returned by lookup) and persists the manifest.
+        """
+        entry = dict(entry)
+        if "hash" not in entry:
+            entry["hash"] = compute_file_hash(entry["path"])
+        entry["ingested_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        self.entries[entry["path"]] = entry
+        self.hashes.add(entry["hash"])
+        self.save()
+        log.info(f"Recorded {entry['path']} in manifest {self.manifest_file}")
+
+
+####################################################################################################
+#                                            Script                                                #
+####################################################################################################
+if __name__ == "__main__":
+    # Query the manifest from the command line, e.g.
+    # python -m scripts.utils.manifest state/manifest/MyProcess.json --path data/input/data.csv
+    parser = argparse.ArgumentParser(description="Query a manifest of already ingested files.")
+    parser.add_argument("manifest_file", help="Path to the manifest JSON file")
+    parser.add_argument("--path", help="Only show whether this file was already ingested")
+    args = parser.parse_args()
+
+    manifest = FileManifest(args.manifest_file)
+    if args.path:
+        ingested, entry = manifest.lookup(args.path)
+        print(f"{'ingested' if ingested else 'new'}\t{entry.get('path')}\t{entry.get('hash', '')}")
+    else:
+        for entry in sorted(manifest.entries.values(), key=lambda e: e.get("ingested_at", "")):
+            print(f"{entry.get('ingested_at')}\t{entry.get('size')}\t{entry.get('hash')}\t{entry.get('path')}")
+        print(f"{len(manifest.entries)} files ingested")
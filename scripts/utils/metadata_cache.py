@@ -0,0 +1,116 @@
+###################################################################################################
+# Cache of D3 Business Objects model metadata shared by all loaders of a run                      #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import json
+import logging
+import os
+import threading
+import time
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Seconds a cached model is valid if not configured otherwise
+DEFAULT_TTL: int = 600
+
+# Cached models per "base_url|model" key as {"fetched_at": epoch seconds, "model": {...}}, shared by the whole run
+CACHE: dict = {}
+LOADED_FILES: set = set()
+CACHE_LOCK = threading.Lock()
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def get_cache_key(base_url: str, model: str) -> str:
+    """
+    Returns the cache key of a model of a D3 instance.
+    """
+    return f"{base_url.rstrip('/')}|{model}"
+
+
+def load_cache_file(cache_file: str):
+    """
+    Merges a persisted cache file into the cache once per run. Newer in-memory entries win.
+    """
+    if not cache_file or cache_file in LOADED_FILES:
+        return
+    LOADED_FILES.add(cache_file)
+    if not os.path.isfile(cache_file):
+        log.debug(f"Metadata cache file {cache_file} does not exist yet.")
+        return
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            entries: dict = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable metadata cache file {cache_file}: {e}")
+        return
+    for key, entry in entries.items():
+        if key not in CACHE or CACHE[key].get("fetched_at", 0) < entry.get("fetched_at", 0):
+            CACHE[key] = entry
+    log.debug(f"Loaded {len(entries)} cached models from {cache_file}")
+
+
+def save_cache_file(cache_file: str):
+    """
+    Persists the cache atomically to the cache file.
+    """
+    if not cache_file:
+        return
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(CACHE, f, indent=4, default=str)
+    os.replace(temp_file, cache_file)
+    log.debug(f"Saved {len(CACHE)} cached models to {cache_file}")
+
+
+def get_cached_model(base_url: str, model: str, ttl: int = DEFAULT_TTL, cache_file: str = "") -> dict:
+    """
+    Returns the cached model metadata, None if the model is not cached or the entry is older than ttl seconds.
+    """
+    with CACHE_LOCK:
+        load_cache_file(cache_file)
+        entry: dict = CACHE.get(get_cache_key(base_url, model))
+    if entry is None:
+        return None
+    age = time.time() - entry.get("fetched_at", 0)
+    if age > ttl:
+        log.debug(f"Cached metadata of model '{model}' expired ({age:.0f} s old)")
+        return None
+    log.debug(f"Using cached metadata of model '{model}' ({age:.0f} s old)")
+    return entry.get("model")
+
+
+def store_models(base_url: str, models: list, cache_file: str = ""):
+    """
+    Caches the metadata of all models of a D3 instance, as returned by the customModels endpoint.
+    """
+    fetched_at = time.time()
+    with CACHE_LOCK:
+        load_cache_file(cache_file)
+        for model in models:
+            CACHE[get_cache_key(base_url, model.get("name", ""))] = {"fetched_at": fetched_at, "model": model}
+        save_cache_file(cache_file)
+    log.debug(f"Cached metadata of {len(models)} models of {base_url}")
+
+
+def invalidate_model(base_url: str, model: str, cache_file: str = ""):
+    """
+    Removes a model from the cache, e.g. after its entity types were changed.
+    """
+    with CACHE_LOCK:
+        load_cache_file(cache_file)
+        if CACHE.pop(get_cache_key(base_url, model), None) is not None:
+            save_cache_file(cache_file)
+            log.debug(f"Invalidated cached metadata of model '{model}'")
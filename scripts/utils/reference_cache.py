@@ -0,0 +1,113 @@
+###################################################################################################
+# Cache of reference datasets for lookups shared by all transformers of a run                     #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+# Seconds a cached reference dataset is valid if not configured otherwise
+DEFAULT_TTL: int = 3600
+
+# Number of reference datasets held in memory if not configured otherwise
+DEFAULT_MAX_ENTRIES: int = 8
+
+# Cached reference datasets per cache key as {"loaded_at": epoch seconds, "items": [...]},
+# least recently used first, shared by the whole run
+CACHE: OrderedDict = OrderedDict()
+CACHE_LOCK = threading.Lock()
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def get_cache_file(cache_dir: str, name: str) -> str:
+    """
+    Returns the file a reference dataset is persisted to, empty if no cache directory is configured.
+    """
+    return os.path.join(cache_dir, f"{name}.reference.pickle") if cache_dir else ""
+
+
+def load_cache_file(cache_file: str, cache_key: str) -> dict:
+    """
+    Returns the entry persisted by a previous run, None if there is none for the cache key.
+    """
+    if not cache_file or not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file, "rb") as f:
+            entry: dict = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        log.warning(f"Ignoring unreadable reference cache file {cache_file}: {e}")
+        return None
+    if entry.get("cache_key") != cache_key:
+        log.info(f"Ignoring reference cache file {cache_file} of a different source")
+        return None
+    return entry
+
+
+def save_cache_file(cache_file: str, entry: dict):
+    """
+    Persists an entry atomically to the cache file.
+    """
+    if not cache_file:
+        return
+    directory = os.path.dirname(cache_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, "wb") as f:
+        pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, cache_file)
+    log.debug(f"Saved {len(entry['items'])} reference items to {cache_file}")
+
+
+def get_reference(cache_key: str, ttl: int = DEFAULT_TTL, cache_file: str = "") -> list:
+    """
+    Returns the cached items of a reference dataset, from memory or from the file of a previous run.
+    None if the dataset is not cached or the entry is older than ttl seconds.
+    """
+    with CACHE_LOCK:
+        entry: dict = CACHE.get(cache_key)
+        if entry is None:
+            entry = load_cache_file(cache_file, cache_key)
+            if entry is not None:
+                CACHE[cache_key] = entry
+        if entry is None:
+            return None
+        age = time.time() - entry.get("loaded_at", 0)
+        if age > ttl:
+            log.debug(f"Cached reference dataset {cache_key} expired ({age:.0f} s old)")
+            del CACHE[cache_key]
+            return None
+        CACHE.move_to_end(cache_key)
+    log.debug(f"Using cached reference dataset {cache_key} ({age:.0f} s old)")
+    return entry["items"]
+
+
+def store_reference(cache_key: str, items: list, max_entries: int = DEFAULT_MAX_ENTRIES, cache_file: str = ""):
+    """
+    Caches the items of a reference dataset. The least recently used datasets are evicted
+    when more than max_entries datasets are cached.
+    """
+    entry: dict = {"cache_key": cache_key, "loaded_at": time.time(), "items": items}
+    with CACHE_LOCK:
+        CACHE[cache_key] = entry
+        CACHE.move_to_end(cache_key)
+        while len(CACHE) > max_entries:
+            evicted_key, _ = CACHE.popitem(last=False)
+            log.debug(f"Evicted reference dataset {evicted_key} from the cache")
+    save_cache_file(cache_file, entry)
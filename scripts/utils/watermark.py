@@ -0,0 +1,91 @@
+###################################################################################################
+# Persistent watermarks for incremental extractions                                               #
+###################################################################################################
+
+####################################################################################################
+#                                           Imports                                                #
+####################################################################################################
+import datetime
+import decimal
+import json
+import logging
+import os
+
+
+####################################################################################################
+#                                            Setup                                                 #
+####################################################################################################
+# Setup Logger
+log = logging.getLogger(__name__)
+
+
+####################################################################################################
+#                                          Functions                                               #
+####################################################################################################
+def encode_watermark(value) -> dict:
+    """
+    Encodes a watermark value (rowversion bytes, datetime, date, int, Decimal or str) as JSON compatible dict.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return {"type": "bytes", "value": bytes(value).hex()}
+    if isinstance(value, datetime.datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"type": "decimal", "value": str(value)}
+    if isinstance(value, int):
+        return {"type": "int", "value": value}
+    return {"type": "str", "value": str(value)}
+
+
+def decode_watermark(data: dict):
+    """
+    Decodes a watermark value encoded by encode_watermark.
+    """
+    value_type: str = data.get("type", "str")
+    value = data.get("value")
+    if value is None:
+        return None
+    if value_type == "bytes":
+        return bytes.fromhex(value)
+    if value_type == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    if value_type == "date":
+        return datetime.date.fromisoformat(value)
+    if value_type == "decimal":
+        return decimal.Decimal(value)
+    if value_type == "int":
+        return int(value)
+    return value
+
+
+def load_watermark(state_file: str, default=None):
+    """
+    Loads the last watermark from the state file, returns default if there is none yet.
+    """
+    if not os.path.isfile(state_file):
+        log.info(f"No watermark found in {state_file}, starting with {default!r}")
+        return default
+    with open(state_file, "r", encoding="utf-8") as f:
+        data: dict = json.load(f)
+    watermark = decode_watermark(data)
+    log.info(f"Loaded watermark {watermark!r} (column {data.get('column')}, updated {data.get('updated_at')}) from {state_file}")
+    return watermark
+
+
+def save_watermark(state_file: str, column: str, value):
+    """
+    Persists the watermark atomically to the state file.
+    """
+    directory = os.path.dirname(state_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data: dict = encode_watermark(value)
+    data["column"] = column
+    data["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(temp_file, state_file)
+    log.info(f"Saved watermark {value!r} for column {column} to {state_file}")
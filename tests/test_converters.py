@@ -0,0 +1,18 @@
+###################################################################################################
+# Tests of the type inference of the converters                                                   #
+###################################################################################################
+import unittest
+
+from scripts.utils.converters import infer_type
+
+
+class TestInferType(unittest.TestCase):
+
+    def test_leading_zeros_stay_strings(self):
+        self.assertEqual(infer_type(["00123", "45"]), "string")
+
+    def test_dates_with_leading_zeros(self):
+        self.assertEqual(infer_type(["01.02.2025", "15.03.2024"], {"date_format": "%d.%m.%Y"}), "date")
+
+    def test_decimal_below_one(self):
+        self.assertEqual(infer_type(["0.5", "12"]), "decimal")
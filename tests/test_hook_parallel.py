@@ -0,0 +1,32 @@
+###################################################################################################
+# Tests of the transfer of items to and from the worker processes of ETLTransformHookFunction     #
+###################################################################################################
+import unittest
+
+from scripts.classes.ETLTransform.ETLTransformHookFunction import pack_items, unpack_items
+
+
+class TestPackItems(unittest.TestCase):
+
+    def test_same_keys_are_packed_as_tuples(self):
+        items = [{"x": 1, "y": 2}, {"x": 3, "y": 4}]
+        fields, rows = pack_items(items)
+        self.assertEqual(fields, ("x", "y"))
+        self.assertEqual(rows, [(1, 2), (3, 4)])
+        self.assertEqual(unpack_items((fields, rows)), items)
+
+    def test_reordered_keys_keep_their_values(self):
+        items = [{"x": 1, "y": 2}, {"y": 3, "x": 4}]
+        self.assertEqual(unpack_items(pack_items(items)), items)
+
+    def test_different_keys_are_sent_as_dicts(self):
+        items = [{"x": 1}, {"x": 2, "y": 3}]
+        self.assertEqual(pack_items(items), (None, items))
+        self.assertEqual(unpack_items(pack_items(items)), items)
+
+    def test_empty(self):
+        self.assertEqual(unpack_items(pack_items([])), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
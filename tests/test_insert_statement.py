@@ -0,0 +1,29 @@
+###################################################################################################
+# Tests of the compilation of the insert statement of ETLLoadMSSQL into a parameterised statement #
+###################################################################################################
+import unittest
+
+from scripts.classes.ETLLoad.ETLLoadMSSQL import ETLLoadMSSQL
+
+
+def compile_statement(insert_statement: str, mappings: dict = None) -> tuple[str, list]:
+    loader = ETLLoadMSSQL({"connection": {"server": "localhost", "database": "test"},
+                           "insert_statement": insert_statement, "mappings": mappings or {}})
+    return loader.compile_insert_statement()
+
+
+class TestCompileInsertStatement(unittest.TestCase):
+
+    def test_placeholders(self):
+        statement, fields = compile_statement("INSERT INTO T (a, b, c) VALUES (@a@, '@b@', '@c')")
+        self.assertEqual(statement, "INSERT INTO T (a, b, c) VALUES (?, ?, ?)")
+        self.assertEqual(fields, ["a", "b", "c"])
+
+    def test_unicode_literal(self):
+        statement, fields = compile_statement("INSERT INTO T (name, city) VALUES (N'@name@', n'@city@')")
+        self.assertEqual(statement, "INSERT INTO T (name, city) VALUES (?, ?)")
+        self.assertEqual(fields, ["name", "city"])
+
+    def test_mapped_fields(self):
+        _, fields = compile_statement("INSERT INTO T (name) VALUES (N'@Name1@')", {"name": "Name1"})
+        self.assertEqual(fields, ["name"])